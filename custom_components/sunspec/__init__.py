@@ -8,23 +8,58 @@ https://github.com/cjne/ha-sunspec
 import asyncio
 from datetime import timedelta
 import logging
+import time
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
+from homeassistant.core import callback
 from homeassistant.core_config import Config
+from homeassistant.helpers import device_registry as dr
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 from homeassistant.helpers.update_coordinator import UpdateFailed
 
+from .api import DeviceRecord
+from .api import PointAccessor
 from .api import SunSpecApiClient
+from .const import BACKOFF_MAX_INTERVAL
 from .const import CONF_ENABLED_MODELS
 from .const import CONF_HOST
+from .const import CONF_KEEP_ALIVE
+from .const import CONF_NORMAL_SCAN_INTERVAL
+from .const import CONF_PARALLEL_POLLS
 from .const import CONF_PORT
+from .const import CONF_READ_GAP
 from .const import CONF_SCAN_INTERVAL
+from .const import CONF_SPARSE_READS
+from .const import CONF_STATIC_SCAN_INTERVAL
+from .const import CONF_TIMEOUT_MAX
+from .const import CONF_TIMEOUT_MIN
 from .const import CONF_UNIT_ID
+from .const import CYCLE_BUDGET
+from .const import DEFAULT_KEEP_ALIVE
 from .const import DEFAULT_MODELS
+from .const import DEFAULT_NORMAL_SCAN_INTERVAL
+from .const import DEFAULT_PARALLEL_POLLS
+from .const import DEFAULT_READ_GAP
+from .const import DEFAULT_SPARSE_READS
+from .const import DEFAULT_STATIC_SCAN_INTERVAL
+from .const import DEFAULT_TIMEOUT_MAX
+from .const import DEFAULT_TIMEOUT_MIN
 from .const import DOMAIN
+from .const import FAST_MODELS
+from .const import INVERTER_MODELS
+from .const import INVERTER_SLEEP_STATES
 from .const import PLATFORMS
+from .const import STALE_DATA_MAX_AGE
 from .const import STARTUP_MESSAGE
+from .const import STATIC_MODELS
+from .const import TIER_FAST
+from .const import TIER_NORMAL
+from .const import TIER_STATIC
+from .scheduler import get_scheduler
+from .scheduler import release_scheduler
+from .transport import PRIORITY_BACKGROUND
+from .transport import PRIORITY_TELEMETRY
 
 SCAN_INTERVAL = timedelta(seconds=30)
 
@@ -77,15 +112,41 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     host = entry.data.get(CONF_HOST)
     port = entry.data.get(CONF_PORT)
     unit_id = entry.data.get(CONF_UNIT_ID, 1)
+    keep_alive = entry.options.get(CONF_KEEP_ALIVE, DEFAULT_KEEP_ALIVE)
+    scheduler = get_scheduler(hass)
+    scheduler.configure(
+        entry.entry_id,
+        entry.options.get(CONF_PARALLEL_POLLS, DEFAULT_PARALLEL_POLLS),
+    )
 
-    client = SunSpecApiClient(host, port, unit_id, hass)
+    client = SunSpecApiClient(
+        host,
+        port,
+        unit_id,
+        hass,
+        keep_alive=keep_alive,
+        timeout_min=entry.options.get(CONF_TIMEOUT_MIN, DEFAULT_TIMEOUT_MIN),
+        timeout_max=entry.options.get(CONF_TIMEOUT_MAX, DEFAULT_TIMEOUT_MAX),
+        sparse=entry.options.get(CONF_SPARSE_READS, DEFAULT_SPARSE_READS),
+        read_gap=entry.options.get(CONF_READ_GAP, DEFAULT_READ_GAP),
+        scheduler=scheduler,
+    )
+    await client.async_load_state()
 
     _LOGGER.debug("Setup conifg entry for SunSpec")
-    coordinator = SunSpecDataUpdateCoordinator(hass, client=client, entry=entry)
+    coordinator = SunSpecDataUpdateCoordinator(
+        hass, client=client, entry=entry, scheduler=scheduler
+    )
     hass.data[DOMAIN][entry.entry_id] = coordinator
 
-    await coordinator.async_config_entry_first_refresh()
+    try:
+        await coordinator.async_config_entry_first_refresh()
+    except Exception:
+        release_scheduler(hass, entry.entry_id)
+        raise
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    # From now on only models with enabled entities are read
+    coordinator.follow_entities = True
     return True
 
 
@@ -104,6 +165,8 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     if unloaded:
         coordinator = hass.data[DOMAIN].pop(entry.entry_id)
         coordinator.unsub()
+        coordinator.api.disconnect()
+        release_scheduler(hass, entry.entry_id)
 
     return True  # unloaded
 
@@ -121,12 +184,24 @@ def get_sunspec_unique_id(
     return f"{config_entry_id}_{key}-{model_id}-{model_index}"
 
 
+def get_model_tier(model_id: int) -> str:
+    """Polling tier of a SunSpec model"""
+    if model_id in FAST_MODELS:
+        return TIER_FAST
+    if model_id in STATIC_MODELS:
+        return TIER_STATIC
+    return TIER_NORMAL
+
+
 class SunSpecDataUpdateCoordinator(DataUpdateCoordinator):
     """Class to manage fetching data from the API."""
 
-    def __init__(self, hass: HomeAssistant, client: SunSpecApiClient, entry) -> None:
+    def __init__(
+        self, hass: HomeAssistant, client: SunSpecApiClient, entry, scheduler=None
+    ) -> None:
         """Initialize."""
         self.api = client
+        self.scheduler = scheduler
         self.hass = hass
         self.entry = entry
 
@@ -135,13 +210,47 @@ class SunSpecDataUpdateCoordinator(DataUpdateCoordinator):
         models = entry.options.get(
             CONF_ENABLED_MODELS, entry.data.get(CONF_ENABLED_MODELS, DEFAULT_MODELS)
         )
-        scan_interval = timedelta(
-            seconds=entry.options.get(
+        self.tier_intervals = {
+            TIER_FAST: entry.options.get(
                 CONF_SCAN_INTERVAL,
                 entry.data.get(CONF_SCAN_INTERVAL, SCAN_INTERVAL.total_seconds()),
+            ),
+            TIER_NORMAL: entry.options.get(
+                CONF_NORMAL_SCAN_INTERVAL, DEFAULT_NORMAL_SCAN_INTERVAL
+            ),
+            TIER_STATIC: entry.options.get(
+                CONF_STATIC_SCAN_INTERVAL, DEFAULT_STATIC_SCAN_INTERVAL
+            ),
+        }
+        self.option_model_filter = set(map(lambda m: int(m), models))
+        # Poll as often as the fastest tier that has enabled models
+        scan_interval = timedelta(
+            seconds=min(
+                [
+                    self.tier_intervals[get_model_tier(model_id)]
+                    for model_id in self.option_model_filter
+                ]
+                or [self.tier_intervals[TIER_FAST]]
             )
         )
-        self.option_model_filter = set(map(lambda m: int(m), models))
+        self.scan_interval = scan_interval
+        # Consecutive cycles the device was unreachable
+        self.backoff = 0
+        # Consecutive cycles the inverter reported it was off or asleep
+        self.asleep = 0
+        # The data is from before the device became unreachable
+        self.stale = False
+        # When polling of the unreachable device reached the backoff ceiling
+        self.ceiling_since = None
+        self.follow_entities = False
+        self.last_read = {}
+        # Identity of the device and the device info built from it per model
+        self.device = None
+        self._device_infos = {}
+        # Point values and update status the listeners were last notified of
+        self._published = {}
+        self._published_status = None
+        self._accessors = {}
         self.unsub = entry.add_update_listener(async_reload_entry)
         _LOGGER.debug(
             "Setup entry with models %s, scan interval %s. IP: %s Port: %s ID: %s",
@@ -160,20 +269,233 @@ class SunSpecDataUpdateCoordinator(DataUpdateCoordinator):
         )
 
     async def _async_update_data(self):
-        """Update data via library."""
+        """Update data via library, when the scheduler gives this entry its turn"""
+        if self.scheduler is None:
+            return await self._async_poll()
+        async with self.scheduler.slot(self.entry.entry_id):
+            return await self._async_poll()
+
+    async def _async_poll(self):
         _LOGGER.debug("SunSpec Update data coordinator update")
-        data = {}
+        interval = self.update_interval.total_seconds()
+        self.api.start_cycle(interval * CYCLE_BUDGET)
+        success = False
         try:
-            model_ids = self.option_model_filter & set(
-                await self.api.async_get_models()
-            )
-            _LOGGER.debug("SunSpec Update data got models %s", model_ids)
-
-            for model_id in model_ids:
-                data[model_id] = await self.api.async_get_data(model_id)
-            self.api.close()
+            models = set(await self.api.async_get_models())
+            model_ids = self.option_model_filter & models
+            instances = None
+            if self.follow_entities:
+                instances = self.enabled_instances()
+                model_ids &= set(instances)
+            # The common model keeps the device registry up to date, with or
+            # without entities of its own
+            model_ids |= {1} & models
+            now = time.monotonic()
+            due = self.due_models(model_ids, now)
+            _LOGGER.debug("SunSpec Update data got models %s, due %s", model_ids, due)
+
+            data = dict(self.data or {})
+            read = {}
+            if due:
+                # Static models alone can wait for live values of other devices
+                priority = (
+                    PRIORITY_BACKGROUND if due <= STATIC_MODELS else PRIORITY_TELEMETRY
+                )
+                read = await self.api.async_get_models_data(
+                    sorted(due), instances, priority=priority
+                )
+                data.update(
+                    {
+                        model_id: wrapper
+                        for model_id, wrapper in read.items()
+                        if model_id in self.option_model_filter
+                    }
+                )
+                self.api.close()
+                if 1 in read:
+                    self.update_device(DeviceRecord.from_wrapper(read[1]))
+                self.last_read.update(dict.fromkeys(read, now))
+            success = True
+            self.stale = False
+            self.ceiling_since = None
+            asleep = self.sleeping(read)
+            if asleep is not None:
+                self.asleep = self.asleep + 1 if asleep else 0
+            elif not INVERTER_MODELS & model_ids:
+                self.asleep = 0
+            self.resume()
             return data
         except Exception as exception:
-            _LOGGER.warning(exception)
-            self.api.reconnect_next()
-            raise UpdateFailed() from exception
+            if self.backoff:
+                _LOGGER.debug("Device still unreachable: %s", exception)
+            else:
+                _LOGGER.warning(exception)
+            if self.back_off() and self.ceiling_since is None:
+                self.ceiling_since = time.monotonic()
+            if self.data is None:
+                raise UpdateFailed() from exception
+            if (
+                self.ceiling_since is not None
+                and time.monotonic() - self.ceiling_since >= STALE_DATA_MAX_AGE
+            ):
+                raise UpdateFailed(
+                    f"Device unreachable for more than {STALE_DATA_MAX_AGE}s "
+                    "at the slowest poll interval"
+                ) from exception
+            # Keep the last values, marked stale, until the device answers again
+            self.stale = True
+            return self.data
+        finally:
+            self.api.end_cycle(success, interval)
+            self.api.async_save_state()
+
+    def sleeping(self, read):
+        """Whether an inverter read this cycle reports it is off or asleep
+
+        None when no operating state was read this cycle.
+        """
+        for model_id in INVERTER_MODELS & set(read):
+            try:
+                return read[model_id].getValue("St") in INVERTER_SLEEP_STATES
+            except KeyError:
+                continue
+        return None
+
+    def back_off(self) -> bool:
+        """Poll an unreachable device less and less often
+
+        Returns whether polling is down to the slowest interval.
+        """
+        self.backoff += 1
+        seconds = self.scan_interval.total_seconds() * 2**self.backoff
+        ceiling = max(BACKOFF_MAX_INTERVAL, self.scan_interval.total_seconds())
+        self.update_interval = timedelta(seconds=min(seconds, ceiling))
+        _LOGGER.debug("Backing off, polling every %s", self.update_interval)
+        return seconds >= ceiling
+
+    def resume(self):
+        """Poll as often as the enabled models are due again"""
+        interval = timedelta(
+            seconds=min(
+                [self.model_interval(model_id) for model_id in self.option_model_filter]
+                or [self.scan_interval.total_seconds()]
+            )
+        )
+        if self.backoff or interval != self.update_interval:
+            _LOGGER.debug("Polling every %s", interval)
+        self.backoff = 0
+        self.update_interval = interval
+
+    def model_interval(self, model_id) -> float:
+        """Seconds between reads of a model, longer for inverters that are asleep"""
+        seconds = self.tier_intervals[get_model_tier(model_id)]
+        if self.asleep and model_id in INVERTER_MODELS:
+            ceiling = max(BACKOFF_MAX_INTERVAL, seconds)
+            seconds = min(seconds * 2**self.asleep, ceiling)
+        return seconds
+
+    def update_device(self, device: DeviceRecord):
+        """Share a new identity of the device with its entities and the registry"""
+        if device == self.device:
+            return
+        if self.device is not None:
+            _LOGGER.info(
+                "Device %s changed from %s to %s",
+                self.entry.title,
+                self.device.sw_version,
+                device.sw_version,
+            )
+            registry = dr.async_get(self.hass)
+            for entry in dr.async_entries_for_config_entry(
+                registry, self.entry.entry_id
+            ):
+                registry.async_update_device(
+                    entry.id,
+                    manufacturer=device.manufacturer,
+                    model=device.model,
+                    sw_version=device.sw_version,
+                )
+        self.device = device
+        self._device_infos.clear()
+
+    def device_info(self, model_info) -> dict:
+        """Device registry info of the device of a model, shared by its entities"""
+        info = self._device_infos.get(model_info["name"])
+        if info is None:
+            info = self._device_infos[model_info["name"]] = {
+                "identifiers": {(DOMAIN, self.entry.entry_id, model_info["name"])},
+                "name": model_info["label"],
+                "model": self.device.model,
+                "sw_version": self.device.sw_version,
+                "manufacturer": self.device.manufacturer,
+            }
+        return info
+
+    def enabled_instances(self) -> dict:
+        """Point keys per instance index per model id that enabled entities show
+
+        The operating state of inverters is always read to detect sleep, and the
+        identity of the device from the common model.
+        """
+        instances = {1: {0: set(DeviceRecord.POINTS)}}
+        for context in self.async_contexts():
+            if context is not None:
+                model_id, model_index, key = context
+                keys = instances.setdefault(model_id, {}).setdefault(model_index, set())
+                keys.add(key)
+                if model_id in INVERTER_MODELS:
+                    keys.add("St")
+        return instances
+
+    def due_models(self, model_ids, now) -> set:
+        """Models whose interval has passed since they were last read"""
+        # Refreshes may fire slightly early, allow for half a cycle
+        slack = self.update_interval.total_seconds() / 2
+        return {
+            model_id
+            for model_id in model_ids
+            if model_id not in self.last_read
+            or now - self.last_read[model_id] >= self.model_interval(model_id) - slack
+        }
+
+    def point_value(self, context):
+        """Value of the point an entity with the given listener context shows"""
+        model_id, model_index, key = context
+        accessor = self._accessors.get(context)
+        if accessor is None:
+            accessor = self._accessors[context] = PointAccessor(key, model_index)
+        try:
+            return accessor.value(self.data[model_id])
+        except (KeyError, IndexError, OverflowError):
+            return None
+
+    @callback
+    def async_add_listener(self, update_callback, context=None):
+        """Listen for updates, remembering the value a new entity starts with"""
+        if context is not None and self.data is not None:
+            self._published[context] = self.point_value(context)
+        return super().async_add_listener(update_callback, context)
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Update only the listeners whose point changed since the last update"""
+        values = {}
+        if self.last_update_success and self.data is not None:
+            values = {
+                context: self.point_value(context) for context in self.async_contexts()
+            }
+        changed = None
+        status = (self.last_update_success, self.stale)
+        if status == self._published_status:
+            changed = {
+                context
+                for context, value in values.items()
+                if context not in self._published or self._published[context] != value
+            }
+        self._published = values
+        self._published_status = status
+
+        for update_callback, context in list(self._listeners.values()):
+            # All listeners are updated when availability or staleness changes
+            if changed is None or context is None or context in changed:
+                update_callback()
@@ -1,18 +1,49 @@
 """Sample API Client."""
 
+import asyncio
 import logging
-import socket
-import threading
 import time
 from types import SimpleNamespace
+from typing import NamedTuple
+import weakref
 
 from homeassistant.core import HomeAssistant
+from homeassistant.core import callback
+from sunspec2 import mdef
 import sunspec2.modbus.client as modbus_client
-from sunspec2.modbus.client import SunSpecModbusClientException
-from sunspec2.modbus.client import SunSpecModbusClientTimeout
+from sunspec2.modbus.client import SunSpecModbusClientError
 from sunspec2.modbus.modbus import ModbusClientError
-
-TIMEOUT = 120
+from sunspec2.modbus.modbus import ModbusClientException
+from sunspec2.modbus.modbus import ModbusClientTimeout
+from sunspec2.modbus.modbus import REQ_COUNT_MAX
+
+from .const import DEFAULT_READ_GAP
+from .const import DEFAULT_SPARSE_READS
+from .const import DEFAULT_TIMEOUT_MAX
+from .const import DEFAULT_TIMEOUT_MIN
+from .decode import ModelDecoder
+from .stats import PollStats
+from .store import async_get_store
+from .transport import ModbusGatewayException
+from .transport import ModbusTcpTransport
+from .transport import PRIORITY_BACKGROUND
+from .transport import PRIORITY_INTERACTIVE
+from .transport import PRIORITY_TELEMETRY
+from .transport import RequestPacer
+
+# Seconds to wait for a device to accept a connection
+CONNECT_TIMEOUT = 3
+# Kept alive connections idle for longer than this are reopened before use
+KEEP_ALIVE_IDLE_TIMEOUT = 120
+# Consecutive failures after which a device is left alone, and for how long
+BREAKER_FAILURES = 3
+BREAKER_RESET_TIMEOUT = 60
+# Seconds before reads are coalesced again after a device rejected them
+COALESCE_RETRY_INTERVAL = 3600
+# Seconds between full reads of a model, which recheck its empty group instances
+GROUP_RECHECK_INTERVAL = 3600
+# Seconds the result of a shared request is handed to later callers
+SHARED_RESULT_FRESHNESS = 2
 
 _LOGGER: logging.Logger = logging.getLogger(__package__)
 
@@ -26,41 +57,55 @@ class ConnectionError(Exception):
 
 
 class SunSpecModelWrapper:
-    def __init__(self, models) -> None:
-        """Sunspec model wrapper"""
+    def __init__(self, models, tables=None) -> None:
+        """Sunspec model wrapper
+
+        tables holds a (decoder, values) pair per model decoded in bulk, or
+        None for models that were not. Values are then read from there instead
+        of the points.
+        """
         self._models = models
+        self._tables = tables
         self.num_models = len(models)
 
     def isValidPoint(self, point_name):
-        point = self.getPoint(point_name)
-        if point.value is None:
-            return False
-        if point.pdef["type"] in ("enum16", "bitfield32"):
-            return True
-        if point.pdef.get("units", None) is None:
+        return self._isValidPoint(point_name, self.getPoint(point_name))
+
+    def _isValidPoint(self, point_name, point):
+        pdef = point.pdef
+        if pdef["type"] not in ("enum16", "bitfield32") and pdef.get("units") is None:
             return False
-        return True
+        return self.getValue(point_name) is not None
+
+    def isEmptyGroup(self, group_keys):
+        """Unpopulated group instances only hold unimplemented values
+
+        Zero is a valid reading, a populated module may report it all over.
+        """
+        return all(self.getValue(key) is None for key in group_keys)
 
     def getKeys(self):
-        keys = list(filter(self.isValidPoint, self._models[0].points.keys()))
-        for group_name in self._models[0].groups:
-            model_group = self._models[0].groups[group_name]
-            if type(model_group) is list:
-                for idx, group in enumerate(model_group):
-                    key_prefix = f"{group_name}:{idx}"
-                    group_keys = map(
-                        lambda gp: f"{key_prefix}:{gp}", group.points.keys()
-                    )
-                    keys.extend(filter(self.isValidPoint, group_keys))
-            else:
-                key_prefix = f"{group_name}:0"
-                group_keys = map(
-                    lambda gp: f"{key_prefix}:{gp}", model_group.points.keys()
-                )
-                keys.extend(filter(self.isValidPoint, group_keys))
-        return keys
+        """Keys of the points sensors are created for, in one pass over the model"""
+        model = self._models[0]
+        points = list(model.points.items())
+        for group_name, model_group in model.groups.items():
+            repeating = type(model_group) is list
+            for idx, group in enumerate(model_group if repeating else [model_group]):
+                group_points = [
+                    (f"{group_name}:{idx}:{name}", point)
+                    for name, point in group.points.items()
+                ]
+                if repeating and self.isEmptyGroup(key for key, _ in group_points):
+                    continue
+                points.extend(group_points)
+        return [key for key, point in points if self._isValidPoint(key, point)]
 
     def getValue(self, point_name, model_index=0):
+        if self._tables is not None and self._tables[model_index] is not None:
+            decoder, values = self._tables[model_index]
+            position = decoder.positions.get(point_name)
+            if position is not None:
+                return values[position]
         point = self.getPoint(point_name, model_index)
         return point.cvalue
 
@@ -71,21 +116,216 @@ class SunSpecModelWrapper:
         return self._models[0].gdef
 
     def getPoint(self, point_name, model_index=0):
-        point_path = point_name.split(":")
-        if len(point_path) == 1:
-            return self._models[model_index].points[point_name]
+        return resolve_point(self._models[model_index], point_name.split(":"))
 
-        group = self._models[model_index].groups[point_path[0]]
-        if type(group) is list:
-            return group[int(point_path[1])].points[point_path[2]]
-        else:
-            if len(point_path) > 2:
-                return group.points[
-                    point_path[2]
-                ]  # Access to the specific point within the group
+
+class DeviceRecord(NamedTuple):
+    """Identity of a device from its common model, shared by all its entities"""
+
+    manufacturer: str
+    model: str
+    sw_version: str
+    serial_number: str
+    group_meta: dict
+
+    # Points of the common model the record is made of
+    POINTS = ("Mn", "Md", "Vr", "SN")
+
+    @classmethod
+    def from_wrapper(cls, wrapper):
+        return cls(
+            *[wrapper.getValue(key) for key in cls.POINTS], wrapper.getGroupMeta()
+        )
+
+
+def resolve_point(model, point_path):
+    if len(point_path) == 1:
+        return model.points[point_path[0]]
+
+    group = model.groups[point_path[0]]
+    if type(group) is list:
+        return group[int(point_path[1])].points[point_path[2]]
+    else:
+        if len(point_path) > 2:
             return group.points[
-                point_name
-            ]  # Generic access if no specific subgrouping is specified
+                point_path[2]
+            ]  # Access to the specific point within the group
+        return group.points[
+            ":".join(point_path)
+        ]  # Generic access if no specific subgrouping is specified
+
+
+class PointAccessor:
+    """Point of a model wrapper, resolved once instead of on every read"""
+
+    def __init__(self, point_name, model_index=0) -> None:
+        self.key = point_name
+        self.model_index = model_index
+        self._path = point_name.split(":")
+        self._model = None
+        self._point = None
+        self._decoder = None
+        self._position = None
+
+    def point(self, wrapper):
+        model = wrapper._models[self.model_index]
+        # Models are updated in place, only a new scan creates new ones
+        if model is not self._model:
+            self._point = resolve_point(model, self._path)
+            self._model = model
+        return self._point
+
+    def value(self, wrapper):
+        table = None if wrapper._tables is None else wrapper._tables[self.model_index]
+        if table is not None:
+            decoder, values = table
+            if decoder is not self._decoder:
+                self._position = decoder.positions.get(self.key)
+                self._decoder = decoder
+            if self._position is not None:
+                return values[self._position]
+        return self.point(wrapper).cvalue
+
+
+def plan_reads(ranges, max_count=REQ_COUNT_MAX, max_gap=DEFAULT_READ_GAP) -> list:
+    """Merge (address, count) register ranges into as few reads as possible
+
+    Ranges closer than max_gap registers are read together and no single read
+    is longer than max_count registers.
+    """
+    blocks = []
+    for addr, count in sorted(ranges):
+        end = addr + count
+        if blocks:
+            start, stop = blocks[-1]
+            if addr - stop <= max_gap and start + max_count > addr:
+                stop = min(max(stop, end), start + max_count)
+                blocks[-1] = (start, stop)
+                addr = max(addr, stop)
+        while addr < end:
+            stop = min(end, addr + max_count)
+            blocks.append((addr, stop))
+            addr = stop
+    return [(start, stop - start) for start, stop in blocks]
+
+
+def extract_range(blocks, addr, count) -> bytes:
+    """Get the register data for a range from a sorted list of (address, data) reads"""
+    data = bytearray()
+    end = addr + count
+    for start, block in blocks:
+        stop = start + len(block) // 2
+        if stop <= addr or start >= end:
+            continue
+        data += block[(max(addr, start) - start) * 2 : (min(end, stop) - start) * 2]
+    return bytes(data)
+
+
+class CircuitBreaker:
+    """Stops connecting to a device that keeps failing
+
+    Closed while the device answers. After BREAKER_FAILURES failures in a row
+    it opens and requests fail fast until BREAKER_RESET_TIMEOUT has passed. A
+    single trial request is then let through half open, its outcome closes or
+    reopens the breaker.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        max_failures: int = BREAKER_FAILURES,
+        reset_timeout: float = BREAKER_RESET_TIMEOUT,
+    ) -> None:
+        self.max_failures = max_failures
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened = None
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened < self.reset_timeout:
+                return False
+            self.state = self.HALF_OPEN
+        return True
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.max_failures:
+            self.state = self.OPEN
+            self.opened = time.monotonic()
+
+
+def select_models(client, model_ids, instances=None) -> list:
+    """Instances of the models to read, all of them for models instances does not list"""
+    return [
+        model
+        for model_id in model_ids
+        for index, model in enumerate(client.models[model_id])
+        if instances is None
+        or model_id not in instances
+        or index in instances[model_id]
+    ]
+
+
+def model_regions(model) -> list:
+    """Register ranges sunspec2 uses when reading a single model"""
+    if model.access_regions:
+        return [
+            (model.model_addr + offset, count) for offset, count in model.access_regions
+        ]
+    return [(model.model_addr, model.len + 2)]
+
+
+class TransportDevice(modbus_client.SunSpecModbusClientDevice):
+    """sunspec2 device reading over the shared asyncio transport of its gateway
+
+    Lets the blocking discovery code of sunspec2 run in the executor without a
+    socket of its own, its requests are handed to the event loop and waited on
+    at the priority of the discovery. Never use it on the event loop itself.
+    """
+
+    def __init__(
+        self,
+        transport: ModbusTcpTransport,
+        unit_id: int,
+        loop,
+        stats=None,
+        priority=PRIORITY_BACKGROUND,
+    ) -> None:
+        super().__init__()
+        self.transport = transport
+        self.unit_id = unit_id
+        self.priority = priority
+        self._loop = loop
+        self._stats = stats
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def connect(self):
+        self._run(self.transport.open(self.priority))
+
+    def is_connected(self):
+        return self.transport.connected
+
+    def read(self, addr, count, op=None):
+        # sunspec2 computes some addresses and lengths as floats
+        return b"".join(
+            self._run(
+                self.transport.read(
+                    self.unit_id, start, length, self.priority, self._stats
+                )
+            )
+            for start, length in plan_reads([(int(addr), int(count))])
+        )
 
 
 # pragma: not covered
@@ -96,9 +336,30 @@ def progress(msg):
 
 class SunSpecApiClient:
     CLIENT_CACHE = {}
-
-    def __init__(self, host: str, port: int, unit_id: int, hass: HomeAssistant) -> None:
-        """Sunspec modbus client."""
+    # Connections shared by all units behind one host:port
+    TRANSPORT_CACHE = {}
+    # Requests in flight and recent results, shared by all clients of a unit
+    SHARED_REQUESTS = {}
+    SHARED_RESULTS = {}
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        unit_id: int,
+        hass: HomeAssistant,
+        keep_alive: bool = True,
+        timeout_min: float = DEFAULT_TIMEOUT_MIN,
+        timeout_max: float = DEFAULT_TIMEOUT_MAX,
+        sparse: bool = DEFAULT_SPARSE_READS,
+        read_gap: int = DEFAULT_READ_GAP,
+        scheduler=None,
+    ) -> None:
+        """Sunspec modbus client.
+
+        Blocking work runs on the thread pool of scheduler if given, or the
+        executor of Home Assistant.
+        """
 
         _LOGGER.debug("New SunspecApi Client")
         self._host = host
@@ -106,79 +367,271 @@ class SunSpecApiClient:
         self._hass = hass
         self._unit_id = unit_id
         self._client_key = f"{host}:{port}:{unit_id}"
-        self._lock = threading.Lock()
-        self._reconnect = False
-
-    def get_client(self, config=None):
+        self._gateway_key = f"{host}:{port}"
+        self._coalesce = True
+        # When to try coalesced reads again, never if None
+        self._coalesce_retry = None
+        self._store = None
+        self._keep_alive = keep_alive
+        self._timeout_min = timeout_min
+        self._timeout_max = timeout_max
+        self._sparse = sparse
+        self._read_gap = read_gap
+        self._scheduler = scheduler
+        # Requests are not started after this time in a poll cycle
+        self._deadline = None
+        self._scan = None
+        self._transport = None
+        # Decoders and latest values of models read in bulk
+        self._decoders = weakref.WeakKeyDictionary()
+        self._tables = weakref.WeakKeyDictionary()
+        # Registers of models last read whole, sparse reads are patched into them
+        self._buffers = weakref.WeakKeyDictionary()
+        self._full_reads = weakref.WeakKeyDictionary()
+        self.breaker = CircuitBreaker()
+        self.stats = PollStats()
+
+    def get_client(self, config=None, priority=PRIORITY_BACKGROUND):
         cached = SunSpecApiClient.CLIENT_CACHE.get(self._client_key, None)
         if cached is None or config is not None:
             _LOGGER.debug("Not using cached connection")
-            cached = self.modbus_connect(config)
+            if config is None and not self.breaker.allow():
+                raise ConnectionError(
+                    f"Not connecting to {self._client_key} after repeated failures"
+                )
+            try:
+                cached = self.modbus_connect(config, priority)
+            except ConnectionError:
+                if config is None:
+                    self.breaker.record_failure()
+                raise
             SunSpecApiClient.CLIENT_CACHE[self._client_key] = cached
-        if self._reconnect:
-            if self.check_port():
-                cached.connect()
-                self._reconnect = False
         return cached
 
-    def async_get_client(self, config=None):
-        return self._hass.async_add_executor_job(self.get_client, config)
+    def async_run(self, func, *args):
+        """Run blocking work in the executor"""
+        if self._scheduler is not None:
+            return self._scheduler.run(func, *args)
+        return self._hass.async_add_executor_job(func, *args)
+
+    async def async_get_client(self, config=None, priority=PRIORITY_BACKGROUND):
+        """Get the scanned client, only going to the executor to connect and scan"""
+        cached = SunSpecApiClient.CLIENT_CACHE.get(self._client_key)
+        if cached is not None and config is None:
+            return cached
+        return await self.async_run(self.get_client, config, priority)
+
+    async def shared(self, name, request, *args, reuse=SHARED_RESULT_FRESHNESS):
+        """Await a request together with concurrent callers asking the same
+
+        Callers within reuse seconds of a successful request get its result
+        without asking the device again.
+        """
+        key = (self._client_key, name)
+        result = SunSpecApiClient.SHARED_RESULTS.get(key)
+        if result is not None and time.monotonic() - result[0] < reuse:
+            return result[1]
+        future = SunSpecApiClient.SHARED_REQUESTS.get(key)
+        if future is None:
+            future = asyncio.ensure_future(request(*args))
+            SunSpecApiClient.SHARED_REQUESTS[key] = future
+            future.add_done_callback(lambda done: self._request_done(key, done, reuse))
+        # One caller giving up does not cancel the request for the others
+        return await asyncio.shield(future)
+
+    @staticmethod
+    def _request_done(key, future, reuse):
+        # Requests of a disconnected client are forgotten
+        if SunSpecApiClient.SHARED_REQUESTS.get(key) is not future:
+            return
+        del SunSpecApiClient.SHARED_REQUESTS[key]
+        if reuse > 0 and not future.cancelled() and future.exception() is None:
+            SunSpecApiClient.SHARED_RESULTS[key] = (time.monotonic(), future.result())
+        else:
+            SunSpecApiClient.SHARED_RESULTS.pop(key, None)
 
     async def async_get_data(self, model_id) -> SunSpecModelWrapper:
         try:
             _LOGGER.debug("Get data for model %s", model_id)
-            return await self.read(model_id)
-        except SunSpecModbusClientTimeout as timeout_error:
+            return await self.shared(("read", model_id), self.read, model_id)
+        except ModbusClientTimeout as timeout_error:
+            _LOGGER.warning("Async get data timeout")
+            raise ConnectionTimeoutError() from timeout_error
+        except ModbusClientError as connect_error:
+            _LOGGER.warning("Async get data connect_error")
+            raise ConnectionError() from connect_error
+
+    async def async_get_models_data(
+        self, model_ids, instances=None, priority=PRIORITY_TELEMETRY
+    ) -> dict:
+        try:
+            _LOGGER.debug("Get data for models %s", model_ids)
+            return await self.async_read_models(model_ids, instances, priority)
+        except ModbusClientTimeout as timeout_error:
             _LOGGER.warning("Async get data timeout")
             raise ConnectionTimeoutError() from timeout_error
-        except SunSpecModbusClientException as connect_error:
+        except ModbusClientError as connect_error:
             _LOGGER.warning("Async get data connect_error")
             raise ConnectionError() from connect_error
 
     async def read(self, model_id) -> SunSpecModelWrapper:
-        return await self._hass.async_add_executor_job(self.read_model, model_id)
+        """Read a model for a user waiting on it, ahead of background polls"""
+        client = await self.async_get_client(priority=PRIORITY_INTERACTIVE)
+        data = await self.guarded(
+            self.async_read_transport, client, [model_id], None, PRIORITY_INTERACTIVE
+        )
+        return data[model_id]
+
+    async def async_read_models(
+        self, model_ids, instances=None, priority=PRIORITY_TELEMETRY
+    ) -> dict:
+        """Read models over the asyncio transport
+
+        instances maps model ids to the indexes of the instances to read, each
+        with the keys of the points needed or None for all of them. Instances it
+        leaves out keep their previous values, models it does not list are read
+        whole. Requests of a higher priority on the same connection go first.
+        """
+        client = await self.async_get_client()
+        return await self.guarded(
+            self.async_read_transport, client, model_ids, instances, priority
+        )
+
+    async def guarded(self, request, *args):
+        """Await a device request, failing fast while the circuit breaker is open"""
+        if not self.breaker.allow():
+            raise ConnectionError(
+                f"Not reading {self._client_key} after repeated failures"
+            )
+        try:
+            result = await request(*args)
+        except ModbusGatewayException:
+            # The gateway answered for a device that did not
+            self.breaker.record_failure()
+            raise
+        except ModbusClientException:
+            # The device answered, it just refused the request
+            self.breaker.record_success()
+            raise
+        except (ModbusClientError, SunSpecModbusClientError, OSError):
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return result
 
     async def async_get_device_info(self) -> SunSpecModelWrapper:
-        return await self.read(1)
+        return await self.shared(("read", 1), self.read, 1)
+
+    async def async_get_device_record(self) -> DeviceRecord:
+        """Identity of the device, without a read if the scan got the common model"""
+        client = await self.async_get_client()
+        common = client.models.get(1)
+        if common and common[0].points["Mn"].value is not None:
+            return DeviceRecord.from_wrapper(SunSpecModelWrapper(common[:1]))
+        return DeviceRecord.from_wrapper(await self.async_get_device_info())
 
-    async def async_get_models(self, config=None) -> list:
+    async def async_get_models(self, config=None, priority=PRIORITY_BACKGROUND) -> list:
         _LOGGER.debug("Fetching models")
-        client = await self.async_get_client(config)
+        if config is None:
+            # A client may be reconnected by the next call, never reuse it
+            client = await self.shared(
+                "client", self.async_get_client, None, priority, reuse=0
+            )
+        else:
+            client = await self.async_get_client(config, priority)
+            # The user asked for a new scan, the persisted one is outdated
+            self._scan = None
+            self.async_save_state()
         model_ids = sorted(list(filter(lambda m: type(m) is int, client.models.keys())))
         return model_ids
 
-    def reconnect_next(self):
-        self._reconnect = True
+    async def async_load_state(self):
+        """Restore what was learned about the device in earlier sessions"""
+        self._store = await async_get_store(self._hass)
+        state = self._store.device(self._client_key)
+        # Units on the same connection share its pacing, the slowest one wins
+        self.pacer.delay = max(self.pacer.delay, state.get("delay", 0))
+        self._scan = state.get("scan")
+
+    @callback
+    def async_save_state(self):
+        if self._store is None:
+            return
+        state = self._store.device(self._client_key)
+        delay = round(self.pacer.delay, 3)
+        if state.get("delay") != delay or state.get("scan") != self._scan:
+            state["delay"] = delay
+            state["scan"] = self._scan
+            self._store.async_save()
+
+    @property
+    def pacer(self) -> RequestPacer:
+        """Pacing of the requests on the connection of the device"""
+        return self.get_transport().pacer
+
+    def get_transport(self) -> ModbusTcpTransport:
+        """Get the connection shared by all units behind the same host and port
+
+        The request timeout bounds of the unit that opened it apply to all of them.
+        """
+        if self._transport is None:
+            transport = SunSpecApiClient.TRANSPORT_CACHE.get(self._gateway_key)
+            if transport is None:
+                transport = self.new_transport(self._host, self._port)
+                # Discovery may run in the executor, the first transport wins
+                transport = SunSpecApiClient.TRANSPORT_CACHE.setdefault(
+                    self._gateway_key, transport
+                )
+            transport.users[self._client_key] = self._keep_alive
+            self._transport = transport
+        return self._transport
+
+    def new_transport(self, host, port) -> ModbusTcpTransport:
+        return ModbusTcpTransport(
+            host, port, self._timeout_max, CONNECT_TIMEOUT, self._timeout_min
+        )
+
+    def disconnect(self):
+        """Stop using the shared transport, it is closed when no other unit uses it"""
+        for shared in (
+            SunSpecApiClient.SHARED_REQUESTS,
+            SunSpecApiClient.SHARED_RESULTS,
+        ):
+            for key in [key for key in shared if key[0] == self._client_key]:
+                del shared[key]
+        if self._transport is None:
+            return
+        self._transport.users.pop(self._client_key, None)
+        if not self._transport.users:
+            self._transport.close()
+            if (
+                SunSpecApiClient.TRANSPORT_CACHE.get(self._gateway_key)
+                is self._transport
+            ):
+                del SunSpecApiClient.TRANSPORT_CACHE[self._gateway_key]
+        self._transport = None
+
+    def start_cycle(self, budget: float):
+        """Start a poll cycle, no new requests are started after budget seconds"""
+        self.stats.start_cycle()
+        self._deadline = time.monotonic() + budget
+
+    def end_cycle(self, success: bool, interval: float):
+        self._deadline = None
+        self.stats.end_cycle(success, interval)
 
     def close(self):
-        client = self.get_client()
-        client.close()
+        """End of a poll cycle, closing the connection unless a unit keeps it alive"""
+        if self._transport is not None and not self._transport.keep_alive:
+            _LOGGER.debug("Closing connection to %s", self._gateway_key)
+            self._transport.close()
 
-    def check_port(self) -> bool:
-        """Check if port is available"""
-        with self._lock:
-            sock_timeout = float(3)
-            _LOGGER.debug(
-                f"Check_Port: opening socket on {self._host}:{self._port} with a {sock_timeout}s timeout."
-            )
-            socket.setdefaulttimeout(sock_timeout)
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock_res = sock.connect_ex((self._host, self._port))
-            is_open = sock_res == 0  # True if open, False if not
-            if is_open:
-                sock.shutdown(socket.SHUT_RDWR)
-                _LOGGER.debug(
-                    f"Check_Port (SUCCESS): port open on {self._host}:{self._port}"
-                )
-            else:
-                _LOGGER.debug(
-                    f"Check_Port (ERROR): port not available on {self._host}:{self._port} - error: {sock_res}"
-                )
-            sock.close()
-            time.sleep(0.1)
-        return is_open
+    def modbus_connect(self, config=None, priority=PRIORITY_BACKGROUND):
+        """Connect and discover the models of the device, in the executor
 
-    def modbus_connect(self, config=None):
+        The requests go over the shared connection of the gateway, a gateway
+        never sees a second socket for the discovery of one of its units.
+        """
         use_config = SimpleNamespace(
             **(
                 config
@@ -186,41 +639,299 @@ class SunSpecApiClient:
             )
         )
         _LOGGER.debug(
-            f"Client connect to IP {use_config.host} port {use_config.port} unit id {use_config.unit_id} using timeout {TIMEOUT}"
+            f"Client connect to IP {use_config.host} port {use_config.port} unit id {use_config.unit_id} using timeout {self._timeout_max}"
         )
-        client = modbus_client.SunSpecModbusClientDeviceTCP(
-            slave_id=use_config.unit_id,
-            ipaddr=use_config.host,
-            ipport=use_config.port,
-            timeout=TIMEOUT,
+        if (use_config.host, use_config.port) == (self._host, self._port):
+            transport = self.get_transport()
+        else:
+            # Another gateway tried from the options flow
+            transport = self.new_transport(use_config.host, use_config.port)
+        client = TransportDevice(
+            transport, use_config.unit_id, self._hass.loop, self.stats, priority
         )
-        if self.check_port():
-            _LOGGER.debug("Inverter ready for Modbus TCP connection")
-            try:
-                with self._lock:
-                    client.connect()
-                if not client.is_connected():
-                    raise ConnectionError(
-                        f"Failed to connect to {self._host}:{self._port} unit id {self._unit_id}"
-                    )
-                _LOGGER.debug("Client connected, perform initial scan")
-                client.scan(
-                    connect=False, progress=progress, full_model_read=False, delay=0.5
-                )
+        try:
+            return self._modbus_connect(client, use_config, config)
+        finally:
+            if transport is not self._transport:
+                self._hass.loop.call_soon_threadsafe(transport.close)
+
+    def _modbus_connect(self, client, use_config, config=None):
+        try:
+            client.connect()
+        except ModbusClientError as err:
+            _LOGGER.debug("Inverter not ready for Modbus TCP connection: %s", err)
+            raise ConnectionError(
+                f"Inverter not active on {use_config.host}:{use_config.port}"
+            ) from err
+        try:
+            _LOGGER.debug("Client connected, perform initial scan")
+            if config is None and self.restore_scan(client):
                 return client
-            except ModbusClientError:
-                raise ConnectionError(
-                    f"Failed to connect to {use_config.host}:{use_config.port} unit id {use_config.unit_id}"
-                )
-        else:
-            _LOGGER.debug("Inverter not ready for Modbus TCP connection")
-            raise ConnectionError(f"Inverter not active on {self._host}:{self._port}")
+            # Each request of the scan is paced by the transport
+            client.scan(connect=False, progress=progress, full_model_read=False)
+            if config is None and self._store is not None:
+                self._scan = self.dump_scan(client)
+            return client
+        except ModbusClientError as err:
+            raise ConnectionError(
+                f"Failed to connect to {use_config.host}:{use_config.port} unit id {use_config.unit_id}"
+            ) from err
+
+    def dump_scan(self, client) -> dict:
+        """Describe the scanned model map of the device so it can be restored later"""
+        if 1 not in client.models:
+            return None
+        common = client.models[1][0]
+        common.read()
+        models = []
+        for model in client.model_list:
+            # The header holds the points repeating group counts depend on
+            header_len = max(2, mdef.get_group_len_points_index(model.gdef)) * 2
+            header = bytearray()
+            for point in model.points.values():
+                if len(header) >= header_len:
+                    break
+                if point.value is None:
+                    header += bytes(point.len * 2)
+                else:
+                    header += point.get_mb()
+            models.append(
+                {
+                    "id": model.model_id,
+                    "addr": model.model_addr,
+                    "len": model.model_len,
+                    "header": header[:header_len].hex(),
+                }
+            )
+        return {
+            "sn": common.points["SN"].value,
+            "version": common.points["Vr"].value,
+            "base_addr": client.base_addr,
+            "models": models,
+        }
+
+    def restore_scan(self, client) -> bool:
+        """Rebuild the model map from the persisted scan instead of scanning
+
+        The cache is only trusted when a read of the common model still finds
+        the same device serial number and firmware version.
+        """
+        scan = self._scan
+        if not scan:
+            return False
+        base_addr = scan["base_addr"]
+        common_def = scan["models"][0]
+        try:
+            data = client.read(
+                base_addr, common_def["addr"] - base_addr + common_def["len"] + 2
+            )
+        except ModbusClientError as err:
+            _LOGGER.debug("Scan cache validation read failed: %s", err)
+            return False
+        if data[:4] != b"SunS":
+            return False
 
-    def read_model(self, model_id) -> dict:
-        client = self.get_client()
-        models = client.models[model_id]
-        for model in models:
-            time.sleep(0.6)
-            model.read()
+        client.delete_models()
+        client.base_addr = base_addr
+        for mid, model_def in enumerate(scan["models"]):
+            model = client.model_class(
+                model_id=model_def["id"],
+                model_addr=model_def["addr"],
+                model_len=model_def["len"],
+                data=bytes.fromhex(model_def["header"]),
+                mb_device=client,
+            )
+            model.mid = f"{client.did}_{mid}"
+            client.add_model(model)
+
+        common = client.models[1][0]
+        common.set_mb(data[(common.model_addr - base_addr) * 2 :], dirty=False)
+        if (common.points["SN"].value, common.points["Vr"].value) != (
+            scan["sn"],
+            scan["version"],
+        ):
+            _LOGGER.info("Device %s changed, scanning models again", self._client_key)
+            client.delete_models()
+            return False
+        _LOGGER.debug("Restored %s models from scan cache", len(scan["models"]))
+        return True
 
-        return SunSpecModelWrapper(models)
+    def model_wrapper(self, models) -> SunSpecModelWrapper:
+        tables = [self._tables.get(model) for model in models]
+        return SunSpecModelWrapper(models, tables if any(tables) else None)
+
+    def decode(self, model, data):
+        """Decode the registers of a model in bulk, or into its points if they are incomplete"""
+        decoder = self._decoders.get(model)
+        if decoder is None:
+            decoder = self._decoders[model] = ModelDecoder(model)
+        values = decoder.decode(data)
+        if values is None:
+            self._tables.pop(model, None)
+            model.set_mb(data, dirty=False)
+        else:
+            self._tables[model] = (decoder, values)
+
+    async def async_read_transport(
+        self, client, model_ids, instances=None, priority=PRIORITY_TELEMETRY
+    ) -> dict:
+        """Read models of a TCP device over the asyncio transport"""
+        self.get_transport()
+        last_used = self._transport.last_used
+        idle = 0 if last_used is None else time.monotonic() - last_used
+        if self._transport.connected and idle >= KEEP_ALIVE_IDLE_TIMEOUT:
+            _LOGGER.debug(
+                "Reopening connection to %s, idle for %.0fs", self._gateway_key, idle
+            )
+            self._transport.close()
+        reused = self._transport.connected
+        if not reused:
+            self.stats.record_reconnect()
+
+        models = select_models(client, model_ids, instances)
+        points = {}
+        if self._sparse and instances:
+            for model_id, selected in instances.items():
+                for index, keys in selected.items():
+                    if keys and model_id in client.models:
+                        points[client.models[model_id][index]] = keys
+        try:
+            done = await self.async_read_blocks(models, points, priority)
+        except ModbusClientException:
+            raise
+        except ModbusClientError as err:
+            if not reused:
+                raise
+            _LOGGER.debug("Kept alive connection failed, reconnecting: %s", err)
+            self.stats.record_retry()
+            self.stats.record_reconnect()
+            self._transport.close()
+            done = await self.async_read_blocks(models, points, priority)
+
+        # Models not read within the cycle budget keep their previous values
+        return {
+            model_id: self.model_wrapper(client.models[model_id])
+            for model_id in model_ids
+            if all(model in done for model in models if model.model_id == model_id)
+        }
+
+    async def async_read_blocks(
+        self, models, points=None, priority=PRIORITY_TELEMETRY
+    ) -> set:
+        """Read the register blocks of all models and fan the data out to them
+
+        Models listed in points with the keys they need are only read sparsely.
+        Returns the models that were read, which is all of them unless the
+        time budget of the poll cycle ran out first.
+
+        Reads are coalesced across models unless the device rejected that while
+        it accepted reads model by model, they are tried again after
+        COALESCE_RETRY_INTERVAL.
+        """
+        if (
+            not self._coalesce
+            and self._coalesce_retry is not None
+            and time.monotonic() >= self._coalesce_retry
+        ):
+            _LOGGER.debug("Coalescing reads of %s again", self._client_key)
+            self._coalesce = True
+        if not self._coalesce:
+            return await self._read_blocks(models, None, priority, False)
+        try:
+            return await self._read_blocks(models, points, priority, True)
+        except ModbusGatewayException:
+            # The device did not answer at all, it rejected nothing
+            raise
+        except ModbusClientException as err:
+            done = await self._read_blocks(models, None, priority, False)
+            _LOGGER.debug("Coalesced read rejected, reading model by model: %s", err)
+            self._coalesce = False
+            self._coalesce_retry = time.monotonic() + COALESCE_RETRY_INTERVAL
+            return done
+
+    async def _read_blocks(self, models, points, priority, coalesce) -> set:
+        if coalesce:
+            spans = [
+                self.model_spans(model, (points or {}).get(model)) for model in models
+            ]
+            reads = plan_reads(
+                [span for ranges in spans for span in ranges], max_gap=self._read_gap
+            )
+        else:
+            spans = [[(model.model_addr, model.len + 2)] for model in models]
+            reads = [region for model in models for region in model_regions(model)]
+        blocks = []
+        timings = []
+        for addr, count in reads:
+            # Requests in flight are bounded by the learned request timeout
+            if self._deadline is not None and time.monotonic() >= self._deadline:
+                break
+            start = time.monotonic()
+            data = await self._transport.read(
+                self._unit_id, addr, count, priority, self.stats
+            )
+            blocks.append((addr, data))
+            timings.append((addr, count, time.monotonic() - start))
+        _LOGGER.debug("Read %s models in %s requests", len(models), len(blocks))
+
+        pending = reads[len(blocks) :]
+        if pending:
+            _LOGGER.warning(
+                "Poll of %s ran out of time, %s of %s requests skipped",
+                self._client_key,
+                len(pending),
+                len(reads),
+            )
+            self.stats.record_overrun()
+        done = [
+            (model, ranges)
+            for model, ranges in zip(models, spans)
+            if not any(
+                start < addr + count and addr < start + length
+                for addr, count in ranges
+                for start, length in pending
+            )
+        ]
+        self.stats.record_reads(
+            [model for model, _ in done], [ranges for _, ranges in done], timings
+        )
+        for model, ranges in done:
+            self.decode(model, self.model_data(model, ranges, blocks))
+        return {model for model, _ in done}
+
+    def model_spans(self, model, keys=None) -> list:
+        """Register ranges to read of a model
+
+        Once the model was read whole, only the ranges of the points of keys,
+        or all but its empty group instances. It is read whole again every
+        GROUP_RECHECK_INTERVAL to pick up changes in those.
+        """
+        table = self._tables.get(model)
+        if (
+            table is None
+            or model not in self._buffers
+            or time.monotonic() - self._full_reads[model] >= GROUP_RECHECK_INTERVAL
+        ):
+            return [(model.model_addr, model.len + 2)]
+        decoder, values = table
+        spans = None if keys is None else decoder.spans(keys)
+        if spans is None:
+            spans = decoder.trimmed_spans(decoder.empty_groups(values))
+        return [(model.model_addr + offset, count) for offset, count in spans]
+
+    def model_data(self, model, ranges, blocks) -> bytes:
+        """Registers of a model from the blocks read, sparse reads fill in its last registers"""
+        whole = [(model.model_addr, model.len + 2)]
+        if ranges == whole:
+            data = extract_range(blocks, *whole[0])
+            if len(data) == whole[0][1] * 2:
+                self._buffers[model] = bytearray(data)
+                self._full_reads[model] = time.monotonic()
+            return data
+        buffer = self._buffers[model]
+        for addr, count in ranges:
+            data = extract_range(blocks, addr, count)
+            if len(data) == count * 2:
+                offset = (addr - model.model_addr) * 2
+                buffer[offset : offset + count * 2] = data
+        return bytes(buffer)
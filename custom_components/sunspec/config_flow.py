@@ -13,12 +13,29 @@ from .api import ConnectionTimeoutError
 from .api import SunSpecApiClient
 from .const import CONF_ENABLED_MODELS
 from .const import CONF_HOST
+from .const import CONF_KEEP_ALIVE
+from .const import CONF_NORMAL_SCAN_INTERVAL
+from .const import CONF_PARALLEL_POLLS
 from .const import CONF_PORT
 from .const import CONF_PREFIX
+from .const import CONF_READ_GAP
 from .const import CONF_SCAN_INTERVAL
+from .const import CONF_SPARSE_READS
+from .const import CONF_STATIC_SCAN_INTERVAL
+from .const import CONF_TIMEOUT_MAX
+from .const import CONF_TIMEOUT_MIN
 from .const import CONF_UNIT_ID
+from .const import DEFAULT_KEEP_ALIVE
 from .const import DEFAULT_MODELS
+from .const import DEFAULT_NORMAL_SCAN_INTERVAL
+from .const import DEFAULT_PARALLEL_POLLS
+from .const import DEFAULT_READ_GAP
+from .const import DEFAULT_SPARSE_READS
+from .const import DEFAULT_STATIC_SCAN_INTERVAL
+from .const import DEFAULT_TIMEOUT_MAX
+from .const import DEFAULT_TIMEOUT_MIN
 from .const import DOMAIN
+from .transport import PRIORITY_INTERACTIVE
 
 _LOGGER: logging.Logger = logging.getLogger(__package__)
 
@@ -144,7 +161,7 @@ class SunSpecFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
 
     async def _show_settings_form(self, user_input):
         """Show the configuration form to edit settings data."""
-        models = set(await self.client.async_get_models())
+        models = set(await self.client.async_get_models(priority=PRIORITY_INTERACTIVE))
         model_filter = {model for model in sorted(models)}
         default_enabled = {model for model in DEFAULT_MODELS if model in models}
         return self.async_show_form(
@@ -188,6 +205,8 @@ class SunSpecOptionsFlowHandler(config_entries.OptionsFlow):
         self.settings = {}
         self.options = {}
         self.coordinator = None
+        # Models found by the scan of the settings, kept when the form is shown again
+        self._models = None
 
     async def async_step_init(self, user_input=None):
         """Manage the options."""
@@ -225,23 +244,45 @@ class SunSpecOptionsFlowHandler(config_entries.OptionsFlow):
 
     async def async_step_model_options(self, user_input=None):
         """Handle a flow initialized by the user."""
+        self._errors = {}
         if user_input is not None:
-            self.options.update(user_input)
-            return await self._update_options()
-
-        prefix = self.config_entry.options.get(
-            CONF_PREFIX, self.config_entry.data.get(CONF_PREFIX)
-        )
-        scan_interval = self.config_entry.options.get(
+            if user_input.get(CONF_TIMEOUT_MIN, DEFAULT_TIMEOUT_MIN) > user_input.get(
+                CONF_TIMEOUT_MAX, DEFAULT_TIMEOUT_MAX
+            ):
+                self._errors["base"] = "timeout_range"
+            else:
+                self.options.update(user_input)
+                return await self._update_options()
+
+        # Show the values that were rejected again, if any
+        options = {**self.config_entry.options, **(user_input or {})}
+        prefix = options.get(CONF_PREFIX, self.config_entry.data.get(CONF_PREFIX))
+        scan_interval = options.get(
             CONF_SCAN_INTERVAL, self.config_entry.data.get(CONF_SCAN_INTERVAL)
         )
+        keep_alive = options.get(CONF_KEEP_ALIVE, DEFAULT_KEEP_ALIVE)
+        normal_scan_interval = options.get(
+            CONF_NORMAL_SCAN_INTERVAL, DEFAULT_NORMAL_SCAN_INTERVAL
+        )
+        static_scan_interval = options.get(
+            CONF_STATIC_SCAN_INTERVAL, DEFAULT_STATIC_SCAN_INTERVAL
+        )
+        timeout_min = options.get(CONF_TIMEOUT_MIN, DEFAULT_TIMEOUT_MIN)
+        timeout_max = options.get(CONF_TIMEOUT_MAX, DEFAULT_TIMEOUT_MAX)
+        sparse_reads = options.get(CONF_SPARSE_READS, DEFAULT_SPARSE_READS)
+        read_gap = options.get(CONF_READ_GAP, DEFAULT_READ_GAP)
+        parallel_polls = options.get(CONF_PARALLEL_POLLS, DEFAULT_PARALLEL_POLLS)
         try:
-            models = set(await self.coordinator.api.async_get_models(self.settings))
+            if self._models is None:
+                self._models = set(
+                    await self.coordinator.api.async_get_models(
+                        self.settings, PRIORITY_INTERACTIVE
+                    )
+                )
+            models = self._models
             model_filter = {model for model in sorted(models)}
             default_enabled = {model for model in DEFAULT_MODELS if model in models}
-            default_models = self.config_entry.options.get(
-                CONF_ENABLED_MODELS, default_enabled
-            )
+            default_models = options.get(CONF_ENABLED_MODELS, default_enabled)
 
             default_models = {model for model in default_models if model in models}
 
@@ -251,12 +292,33 @@ class SunSpecOptionsFlowHandler(config_entries.OptionsFlow):
                     {
                         vol.Optional(CONF_PREFIX, default=prefix): str,
                         vol.Optional(CONF_SCAN_INTERVAL, default=scan_interval): int,
+                        vol.Optional(
+                            CONF_NORMAL_SCAN_INTERVAL, default=normal_scan_interval
+                        ): vol.All(int, vol.Range(min=1)),
+                        vol.Optional(
+                            CONF_STATIC_SCAN_INTERVAL, default=static_scan_interval
+                        ): vol.All(int, vol.Range(min=1)),
+                        vol.Optional(CONF_KEEP_ALIVE, default=keep_alive): bool,
+                        vol.Optional(CONF_TIMEOUT_MIN, default=timeout_min): vol.All(
+                            int, vol.Range(min=1)
+                        ),
+                        vol.Optional(CONF_TIMEOUT_MAX, default=timeout_max): vol.All(
+                            int, vol.Range(min=1)
+                        ),
+                        vol.Optional(CONF_SPARSE_READS, default=sparse_reads): bool,
+                        vol.Optional(CONF_READ_GAP, default=read_gap): vol.All(
+                            int, vol.Range(min=0)
+                        ),
+                        vol.Optional(
+                            CONF_PARALLEL_POLLS, default=parallel_polls
+                        ): vol.All(int, vol.Range(min=1)),
                         vol.Optional(
                             CONF_ENABLED_MODELS,
                             default=default_models,
                         ): cv.multi_select(model_filter),
                     }
                 ),
+                errors=self._errors,
             )
         except Exception as e:
             set_connection_error(
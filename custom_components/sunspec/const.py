@@ -30,6 +30,14 @@ CONF_SLAVE_ID = "slave_id"  # Deprecated, use CONF_UNIT_ID
 CONF_PREFIX = "prefix"
 CONF_SCAN_INTERVAL = "scan_interval"
 CONF_ENABLED_MODELS = "models_enabled"
+CONF_KEEP_ALIVE = "keep_alive"
+CONF_NORMAL_SCAN_INTERVAL = "normal_scan_interval"
+CONF_STATIC_SCAN_INTERVAL = "static_scan_interval"
+CONF_TIMEOUT_MIN = "timeout_min"
+CONF_TIMEOUT_MAX = "timeout_max"
+CONF_SPARSE_READS = "sparse_reads"
+CONF_READ_GAP = "read_gap"
+CONF_PARALLEL_POLLS = "parallel_polls"
 
 DEFAULT_MODELS = set(
     [
@@ -61,8 +69,70 @@ DEFAULT_MODELS = set(
         809,
     ]
 )
+# Polling tiers, fast models are read every scan interval and models not
+# listed below are read at the normal interval
+TIER_FAST = "fast"
+TIER_NORMAL = "normal"
+TIER_STATIC = "static"
+FAST_MODELS = set(
+    [
+        101,
+        102,
+        103,
+        111,
+        112,
+        113,
+        124,
+        160,
+        201,
+        202,
+        203,
+        204,
+        211,
+        212,
+        213,
+        214,
+        401,
+        402,
+        403,
+        404,
+        501,
+        502,
+        701,
+        713,
+        714,
+        802,
+        803,
+    ]
+)
+# Common, nameplate, basic settings and DER capacity
+STATIC_MODELS = set([1, 120, 121, 702])
+# Inverter models, and their operating states (St) of an inverter that is off or asleep
+INVERTER_MODELS = set([101, 102, 103, 111, 112, 113])
+INVERTER_SLEEP_STATES = set([1, 2])
+
 # Defaults
 DEFAULT_NAME = DOMAIN
+DEFAULT_KEEP_ALIVE = True
+DEFAULT_NORMAL_SCAN_INTERVAL = 300
+DEFAULT_STATIC_SCAN_INTERVAL = 3600
+# Bounds in seconds of the request timeout learned from response times
+DEFAULT_TIMEOUT_MIN = 2
+DEFAULT_TIMEOUT_MAX = 30
+# Only read the points of enabled entities once a model was read whole
+DEFAULT_SPARSE_READS = True
+# Number of unused registers we accept to read in order to merge two ranges
+DEFAULT_READ_GAP = 16
+# Devices polled at the same time across all entries, an integration wide
+# setting stored in the options of each entry where the lowest value applies
+DEFAULT_PARALLEL_POLLS = 8
+# Share of the poll interval a poll cycle may spend reading
+CYCLE_BUDGET = 0.9
+# Ceiling in seconds of the poll interval of unreachable or sleeping devices
+BACKOFF_MAX_INTERVAL = 900
+# Seconds an unreachable device keeps its last values once polling backed off
+# to the ceiling, it is reported unavailable after that
+STALE_DATA_MAX_AGE = 3600
 
 STARTUP_MESSAGE = f"""
 -------------------------------------------------------------------
@@ -0,0 +1,185 @@
+"""Bulk decoding of SunSpec model registers."""
+
+import math
+import struct
+
+from sunspec2 import mb
+from sunspec2 import mdef
+
+# Point types unpacked in bulk, others are decoded point by point
+STRUCT_CODES = {
+    mdef.TYPE_INT16: "h",
+    mdef.TYPE_UINT16: "H",
+    mdef.TYPE_COUNT: "H",
+    mdef.TYPE_ACC16: "H",
+    mdef.TYPE_ENUM16: "H",
+    mdef.TYPE_BITFIELD16: "H",
+    mdef.TYPE_PAD: "H",
+    mdef.TYPE_SUNSSF: "h",
+    mdef.TYPE_INT32: "i",
+    mdef.TYPE_UINT32: "I",
+    mdef.TYPE_ACC32: "I",
+    mdef.TYPE_ENUM32: "I",
+    mdef.TYPE_BITFIELD32: "I",
+    mdef.TYPE_IPADDR: "I",
+    mdef.TYPE_INT64: "q",
+    mdef.TYPE_UINT64: "Q",
+    mdef.TYPE_ACC64: "Q",
+    mdef.TYPE_FLOAT32: "f",
+    mdef.TYPE_FLOAT64: "d",
+}
+# Raw values marking unimplemented points, floats use NaN
+UNIMPLEMENTED = {
+    **mb.unimpl_value,
+    mdef.TYPE_COUNT: mb.SUNS_UNIMPL_UINT16,
+    mdef.TYPE_UINT64: mb.SUNS_UNIMPL_UINT64,
+    mdef.TYPE_PAD: None,
+    mdef.TYPE_FLOAT32: None,
+    mdef.TYPE_FLOAT64: None,
+}
+POWERS = {sf: math.pow(10, sf) for sf in range(-10, 11)}
+
+
+class ModelDecoder:
+    """Decode all points of a model instance from its registers in one pass
+
+    The values match the sunspec2 point cvalue, keyed like SunSpecModelWrapper
+    keys. Unimplemented points decode to None.
+    """
+
+    def __init__(self, model) -> None:
+        points = [(key, point, None) for key, point in model.points.items()]
+        repeating = set()
+        for group_name, group in model.groups.items():
+            groups = group if isinstance(group, list) else [group]
+            for index, group in enumerate(groups):
+                prefix = f"{group_name}:{index}:"
+                if isinstance(model.groups[group_name], list):
+                    repeating.add(prefix)
+                points.extend(
+                    (f"{prefix}{key}", point, (prefix, group))
+                    for key, point in group.points.items()
+                )
+        points.sort(key=lambda p: p[1].offset)
+        self.length = int(model.len) + 2
+
+        self.positions = {}
+        # Register offset and length of each point
+        self._extents = []
+        self._bulk = []
+        self._single = []
+        fmt = [">"]
+        end = 0
+        for position, (key, point, _) in enumerate(points):
+            self.positions[key] = position
+            self._extents.append((point.offset, int(point.len)))
+            ptype = point.pdef[mdef.TYPE]
+            code = STRUCT_CODES.get(ptype)
+            offset = point.offset * 2
+            length = int(point.len) * 2
+            if code is not None and struct.calcsize(code) == length and offset >= end:
+                if offset > end:
+                    fmt.append(f"{offset - end}x")
+                fmt.append(code)
+                end = offset + length
+                self._bulk.append((position, UNIMPLEMENTED.get(ptype)))
+            else:
+                self._single.append((position, offset, length, point.info))
+        self._struct = struct.Struct("".join(fmt))
+
+        # Positions and register range of each repeating group instance
+        self._instances = {}
+        for position, (_, point, group) in enumerate(points):
+            if group is not None and group[0] in repeating:
+                positions, start, end = self._instances.get(
+                    group[0], ([], point.offset, point.offset)
+                )
+                positions.append(position)
+                self._instances[group[0]] = (
+                    positions,
+                    min(start, point.offset),
+                    max(end, point.offset + int(point.len)),
+                )
+
+        # Scale factors are points of the same group or of the model
+        self._scaled = []
+        self._sf_positions = {}
+        for position, (key, point, group) in enumerate(points):
+            if not point.sf_required:
+                continue
+            if point.sf is None:
+                self._scaled.append((position, None, point.sf_value))
+            elif group is not None and point.sf in group[1].points:
+                self._scaled.append((position, self.positions[group[0] + point.sf], 0))
+            elif point.sf in model.points:
+                self._scaled.append((position, self.positions[point.sf], 0))
+        for position, sf_position, _ in self._scaled:
+            if sf_position is not None:
+                self._sf_positions[position] = sf_position
+
+    def spans(self, keys) -> list:
+        """Register ranges in the model holding the points of keys and their scale factors
+
+        Offsets count from the model id register. None if a key is unknown.
+        """
+        positions = set()
+        for key in keys:
+            position = self.positions.get(key)
+            if position is None:
+                return None
+            positions.add(position)
+            if position in self._sf_positions:
+                positions.add(self._sf_positions[position])
+        return sorted(self._extents[position] for position in positions)
+
+    def empty_groups(self, values) -> set:
+        """Prefixes of repeating group instances with only unimplemented values"""
+        return {
+            prefix
+            for prefix, (positions, _, _) in self._instances.items()
+            if all(values[position] is None for position in positions)
+        }
+
+    def trimmed_spans(self, prefixes) -> list:
+        """Register ranges of the model without the group instances of prefixes"""
+        spans = []
+        start = 0
+        for gap_start, gap_end in sorted(
+            self._instances[prefix][1:] for prefix in prefixes
+        ):
+            if gap_start > start:
+                spans.append((start, gap_start - start))
+            start = max(start, gap_end)
+        if start < self.length:
+            spans.append((start, self.length - start))
+        return spans
+
+    def decode(self, data) -> list:
+        """Point values in position order, None if the data is too short"""
+        if len(data) < self._struct.size:
+            return None
+        values = [None] * len(self.positions)
+        for (position, unimplemented), value in zip(
+            self._bulk, self._struct.unpack_from(data)
+        ):
+            # NaN never equals itself
+            if value != unimplemented and value == value:
+                values[position] = value
+        for position, offset, length, info in self._single:
+            if offset + length > len(data):
+                continue
+            try:
+                value = info.data_to(data[offset : offset + length])
+            except ValueError:
+                continue
+            if info.is_impl(value):
+                values[position] = value
+
+        for position, sf_position, sf in self._scaled:
+            value = values[position]
+            if sf_position is not None:
+                sf = values[sf_position]
+            if value is not None and sf:
+                power = POWERS.get(sf) or math.pow(10, sf)
+                values[position] = round(value * power, -sf)
+        return values
@@ -0,0 +1,41 @@
+"""Diagnostics support for SunSpec."""
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import CONF_HOST
+from .const import DOMAIN
+
+TO_REDACT = {CONF_HOST}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict:
+    """Poll statistics of a config entry"""
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+    api = coordinator.api
+    scheduler = coordinator.scheduler
+    return {
+        "entry": {
+            "data": async_redact_data(dict(entry.data), TO_REDACT),
+            "options": dict(entry.options),
+        },
+        "polling": {
+            "update_interval_s": coordinator.update_interval.total_seconds(),
+            "tier_intervals_s": coordinator.tier_intervals,
+            "last_update_success": coordinator.last_update_success,
+            "backoff": coordinator.backoff,
+            "stale": coordinator.stale,
+            "pacing_delay_s": api.pacer.delay,
+            "response_time_s": api.pacer.response_time,
+            "circuit_breaker": api.breaker.state,
+        },
+        "scheduler": {
+            "parallel_polls": scheduler.limit,
+            "active": scheduler.active,
+            "waiting": scheduler.waiting,
+        },
+        "stats": api.stats.as_dict(),
+    }
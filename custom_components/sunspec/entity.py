@@ -2,13 +2,10 @@
 
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
-from .const import DOMAIN
-
 
 class SunSpecEntity(CoordinatorEntity):
-    def __init__(self, coordinator, config_entry, device_info, model_info):
-        super().__init__(coordinator)
-        self._device_data = device_info
+    def __init__(self, coordinator, config_entry, model_info, context=None):
+        super().__init__(coordinator, context)
         self.config_entry = config_entry
         self.model_info = model_info
 
@@ -17,14 +14,11 @@ class SunSpecEntity(CoordinatorEntity):
     #    """Return a unique ID to use for this entity."""
     #    return self.config_entry.entry_id
 
+    @property
+    def assumed_state(self):
+        """The device is unreachable and the last known values are shown"""
+        return self.coordinator.stale
+
     @property
     def device_info(self):
-        return {
-            "identifiers": {
-                (DOMAIN, self.config_entry.entry_id, self.model_info["name"])
-            },
-            "name": self.model_info["label"],
-            "model": self._device_data.getValue("Md"),
-            "sw_version": self._device_data.getValue("Vr"),
-            "manufacturer": self._device_data.getValue("Mn"),
-        }
+        return self.coordinator.device_info(self.model_info)
@@ -0,0 +1,120 @@
+"""Domain wide scheduling of SunSpec poll cycles."""
+
+import asyncio
+from collections import OrderedDict
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from homeassistant.core import HomeAssistant
+
+from .const import DEFAULT_PARALLEL_POLLS
+from .const import DOMAIN_DATA
+
+# Threads doing the blocking Modbus work of all devices
+POOL_WORKERS = 8
+
+
+class PollScheduler:
+    """Lets a bounded number of devices poll at once, taking turns between entries
+
+    Waiting poll cycles are queued per entry and the entries are served round
+    robin, so a device polling often cannot crowd out the others. Blocking
+    work runs on a dedicated thread pool instead of the shared executor of
+    Home Assistant.
+    """
+
+    def __init__(self, workers: int = POOL_WORKERS) -> None:
+        self.active = 0
+        # Parallel poll limit configured by each entry, the lowest one applies
+        self._limits = {}
+        self._waiting = OrderedDict()
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="sunspec"
+        )
+
+    @property
+    def limit(self) -> int:
+        return min(self._limits.values(), default=DEFAULT_PARALLEL_POLLS)
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(queue) for queue in self._waiting.values())
+
+    @property
+    def entries(self) -> int:
+        return len(self._limits)
+
+    def configure(self, key, limit: int):
+        self._limits[key] = max(1, limit)
+        self._wake()
+
+    def remove(self, key):
+        self._limits.pop(key, None)
+        self._wake()
+
+    @asynccontextmanager
+    async def slot(self, key):
+        """Wait for the turn of key to poll"""
+        await self.acquire(key)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, key):
+        if self.active < self.limit and not self._waiting:
+            self.active += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(key, deque()).append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The turn was granted as the wait was cancelled
+                self.release()
+            raise
+
+    def release(self):
+        self.active -= 1
+        self._wake()
+
+    def _wake(self):
+        while self.active < self.limit and self._waiting:
+            key, queue = next(iter(self._waiting.items()))
+            future = queue.popleft()
+            if queue:
+                self._waiting.move_to_end(key)
+            else:
+                del self._waiting[key]
+            if not future.done():
+                self.active += 1
+                future.set_result(None)
+
+    def run(self, func, *args) -> asyncio.Future:
+        """Run blocking work on the polling thread pool"""
+        return asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+def get_scheduler(hass: HomeAssistant) -> PollScheduler:
+    """Get the poll scheduler shared by all entries"""
+    domain_data = hass.data.setdefault(DOMAIN_DATA, {})
+    if "scheduler" not in domain_data:
+        domain_data["scheduler"] = PollScheduler()
+    return domain_data["scheduler"]
+
+
+def release_scheduler(hass: HomeAssistant, key):
+    """Stop an entry using the scheduler, shutting it down after the last one"""
+    domain_data = hass.data.get(DOMAIN_DATA, {})
+    scheduler = domain_data.get("scheduler")
+    if scheduler is None:
+        return
+    scheduler.remove(key)
+    if not scheduler.entries:
+        scheduler.shutdown()
+        del domain_data["scheduler"]
@@ -1,12 +1,14 @@
 """Sensor platform for SunSpec."""
 
 import logging
+from typing import NamedTuple
 
 from homeassistant.components.sensor import RestoreSensor
 from homeassistant.components.sensor import SensorDeviceClass
 from homeassistant.components.sensor import SensorEntity
 from homeassistant.components.sensor import SensorStateClass
 from homeassistant.const import DEGREE
+from homeassistant.const import EntityCategory
 from homeassistant.const import PERCENTAGE
 from homeassistant.const import UnitOfApparentPower
 from homeassistant.const import UnitOfDataRate
@@ -24,6 +26,7 @@ from homeassistant.const import UnitOfTemperature
 from homeassistant.const import UnitOfTime
 
 from . import get_sunspec_unique_id
+from .api import PointAccessor
 from .const import CONF_PREFIX
 from .const import DOMAIN
 from .entity import SunSpecEntity
@@ -66,36 +69,139 @@ HA_META = {
     "bitfield32": [None, ICON_DEFAULT, SensorDeviceClass.ENUM],
 }
 
+# Poll cycle statistics shown as diagnostic sensors: name, unit and state class
+POLL_SENSORS = {
+    "cycle_duration": [
+        "Poll cycle duration",
+        UnitOfTime.MILLISECONDS,
+        SensorStateClass.MEASUREMENT,
+    ],
+    "cycle_budget": [
+        "Poll cycle interval used",
+        PERCENTAGE,
+        SensorStateClass.MEASUREMENT,
+    ],
+    "requests": ["Poll requests", None, SensorStateClass.MEASUREMENT],
+    "registers": ["Poll registers read", None, SensorStateClass.MEASUREMENT],
+    "pacing": [
+        "Poll pacing delay",
+        UnitOfTime.MILLISECONDS,
+        SensorStateClass.MEASUREMENT,
+    ],
+    "retries": ["Poll retries", None, SensorStateClass.TOTAL_INCREASING],
+    "reconnects": ["Poll reconnects", None, SensorStateClass.TOTAL_INCREASING],
+    "timeouts": ["Poll timeouts", None, SensorStateClass.TOTAL_INCREASING],
+}
+
+
+def enum_lookup(symbols) -> dict:
+    """Map raw enum values to symbol names, ambiguous values map to None"""
+    names = {}
+    for symbol in symbols:
+        value = symbol["value"]
+        names[value] = None if value in names else symbol["name"][:255]
+    return names
+
+
+class BitfieldDecoder:
+    """Render bitfield values as the names of the set bits"""
+
+    # Number of rendered values to remember, status bits rarely change
+    CACHE_SIZE = 32
+
+    def __init__(self, symbols) -> None:
+        self._masks = [
+            (1 << int(symbol["value"]), symbol["name"]) for symbol in symbols
+        ]
+        self._rendered = {}
+
+    def __call__(self, val):
+        rendered = self._rendered.get(val)
+        if rendered is None:
+            rendered = ",".join(name for mask, name in self._masks if val & mask)[:255]
+            if len(self._rendered) >= self.CACHE_SIZE:
+                self._rendered.clear()
+            self._rendered[val] = rendered
+        return rendered
+
+
+class SensorDescriptor(NamedTuple):
+    """What the sensors of a point look like, the same for all devices"""
+
+    meta: dict
+    group_meta: dict
+    unit: str
+    icon: str
+    device_class: str
+    options: list
+    decode: object
+
+
+# Descriptors by model id and point key
+DESCRIPTORS = {}
+
+
+def sensor_descriptor(model_id, model_wrapper, key) -> SensorDescriptor:
+    """Descriptor of the sensors of a point, built once per model definition"""
+    descriptor = DESCRIPTORS.get((model_id, key))
+    if descriptor is not None:
+        return descriptor
+    meta = model_wrapper.getMeta(key)
+    sunspec_unit = meta.get("units", meta.get("type", ""))
+    unit, icon, device_class = HA_META.get(
+        sunspec_unit, [sunspec_unit, ICON_DEFAULT, None]
+    )
+    options = []
+    decode = None
+    vtype = meta["type"]
+    if vtype in ("enum16", "bitfield32"):
+        symbols = meta.get("symbols", None)
+        if symbols is None:
+            device_class = None
+        else:
+            device_class = SensorDeviceClass.ENUM
+            if vtype == "enum16":
+                decode = enum_lookup(symbols).get
+            else:
+                decode = BitfieldDecoder(symbols)
+            options = [item["name"] for item in symbols]
+            options.append("")
+    if unit == UnitOfElectricCurrent.AMPERE and "DC" in meta.get("label", key):
+        icon = ICON_DC_AMPS
+    descriptor = DESCRIPTORS[(model_id, key)] = SensorDescriptor(
+        meta, model_wrapper.getGroupMeta(), unit, icon, device_class, options, decode
+    )
+    return descriptor
+
 
 async def async_setup_entry(hass, entry, async_add_devices):
     """Setup sensor platform."""
     coordinator = hass.data[DOMAIN][entry.entry_id]
     sensors = []
-    device_info = await coordinator.api.async_get_device_info()
+    # The first refresh already read the common model if it is enabled
+    if coordinator.device is None:
+        coordinator.update_device(await coordinator.api.async_get_device_record())
     prefix = entry.options.get(CONF_PREFIX, entry.data.get(CONF_PREFIX, ""))
     for model_id in coordinator.data.keys():
         model_wrapper = coordinator.data[model_id]
         for key in model_wrapper.getKeys():
+            descriptor = sensor_descriptor(model_id, model_wrapper, key)
+            if descriptor.device_class == SensorDeviceClass.ENERGY:
+                sensor_class = SunSpecEnergySensor
+            else:
+                sensor_class = SunSpecSensor
             for model_index in range(model_wrapper.num_models):
                 data = {
-                    "device_info": device_info,
                     "key": key,
                     "model_id": model_id,
                     "model_index": model_index,
-                    "model": model_wrapper,
+                    "descriptor": descriptor,
                     "prefix": prefix,
                 }
+                sensors.append(sensor_class(coordinator, entry, data))
 
-                meta = model_wrapper.getMeta(key)
-                sunspec_unit = meta.get("units", "")
-                ha_meta = HA_META.get(sunspec_unit, [sunspec_unit, None, None])
-                device_class = ha_meta[2]
-                if device_class == SensorDeviceClass.ENERGY:
-                    _LOGGER.debug("Adding energy sensor")
-                    sensors.append(SunSpecEnergySensor(coordinator, entry, data))
-                else:
-                    sensors.append(SunSpecSensor(coordinator, entry, data))
-
+    for key in POLL_SENSORS:
+        sensors.append(SunSpecPollSensor(coordinator, entry, key, prefix))
     async_add_devices(sensors)
 
 
@@ -103,22 +209,25 @@ class SunSpecSensor(SunSpecEntity, SensorEntity):
     """sunspec Sensor class."""
 
     def __init__(self, coordinator, config_entry, data):
+        # The coordinator only updates sensors when their point changes
         super().__init__(
-            coordinator, config_entry, data["device_info"], data["model"].getGroupMeta()
+            coordinator,
+            config_entry,
+            data["descriptor"].group_meta,
+            (data["model_id"], data["model_index"], data["key"]),
         )
+        descriptor = data["descriptor"]
         self.model_id = data["model_id"]
         self.model_index = data["model_index"]
-        self.model_wrapper = data["model"]
         self.key = data["key"]
-        self._meta = self.model_wrapper.getMeta(self.key)
-        self._group_meta = self.model_wrapper.getGroupMeta()
-        self._point_meta = self.model_wrapper.getPoint(self.key).pdef
-        sunspec_unit = self._meta.get("units", self._meta.get("type", ""))
-        ha_meta = HA_META.get(sunspec_unit, [sunspec_unit, ICON_DEFAULT, None])
-        self.unit = ha_meta[0]
-        self.use_icon = ha_meta[1]
-        self.use_device_class = ha_meta[2]
-        self._options = []
+        self._accessor = PointAccessor(self.key, self.model_index)
+        self._meta = descriptor.meta
+        self._group_meta = descriptor.group_meta
+        self.unit = descriptor.unit
+        self.use_icon = descriptor.icon
+        self.use_device_class = descriptor.device_class
+        self._options = descriptor.options
+        self._decode = descriptor.decode
         # Used if this is an energy sensor and the read value is 0
         # Updated wheneve the value read is not 0
         self.lastKnown = None
@@ -128,16 +237,6 @@ class SunSpecSensor(SunSpecEntity, SensorEntity):
             config_entry.entry_id, self.key, self.model_id, self.model_index
         )
 
-        vtype = self._meta["type"]
-        if vtype in ("enum16", "bitfield32"):
-            self._options = self._point_meta.get("symbols", None)
-            if self._options is None:
-                self.use_device_class = None
-            else:
-                self.use_device_class = SensorDeviceClass.ENUM
-                self._options = [item["name"] for item in self._options]
-                self._options.append("")
-
         self._device_id = config_entry.entry_id
         name = self._group_meta.get("name", str(self.model_id))
         if self.model_index > 0:
@@ -147,9 +246,6 @@ class SunSpecSensor(SunSpecEntity, SensorEntity):
             name = f"{name} {key_parts[0]} {key_parts[1]}"
 
         desc = self._meta.get("label", self.key)
-        if self.unit == UnitOfElectricCurrent.AMPERE and "DC" in desc:
-            self.use_icon = ICON_DC_AMPS
-
         if data["prefix"] != "":
             name = f"{data['prefix']} {name}"
 
@@ -188,15 +284,13 @@ class SunSpecSensor(SunSpecEntity, SensorEntity):
 
     @property
     def assumed_state(self):
-        return self._assumed_state
+        return self._assumed_state or super().assumed_state
 
     @property
     def native_value(self):
         """Return the state of the sensor."""
         try:
-            val = self.coordinator.data[self.model_id].getValue(
-                self.key, self.model_index
-            )
+            val = self._accessor.value(self.coordinator.data[self.model_id])
         except KeyError:
             _LOGGER.warning("Model %s not found", self.model_id)
             return None
@@ -205,25 +299,9 @@ class SunSpecSensor(SunSpecEntity, SensorEntity):
                 "Math overflow error when retreiving calculated value for %s", self.key
             )
             return None
-        vtype = self._meta["type"]
-        if vtype in ("enum16", "bitfield32"):
-            symbols = self._point_meta.get("symbols", None)
-            if symbols is None:
-                return val
-            if vtype == "enum16":
-                symbol = list(filter(lambda s: s["value"] == val, symbols))
-                if len(symbol) == 1:
-                    return symbol[0]["name"][:255]
-                else:
-                    return None
-            else:
-                symbols = list(
-                    filter(lambda s: (val >> int(s["value"])) & 1 == 1, symbols)
-                )
-                if len(symbols) > 0:
-                    return ",".join(map(lambda s: s["name"], symbols))[:255]
-                return ""
-        return val
+        if self._decode is None or val is None:
+            return val
+        return self._decode(val)
 
     @property
     def native_unit_of_measurement(self):
@@ -265,9 +343,7 @@ class SunSpecSensor(SunSpecEntity, SensorEntity):
 
         vtype = self._meta["type"]
         if vtype in ("enum16", "bitfield32"):
-            attrs["raw"] = self.coordinator.data[self.model_id].getValue(
-                self.key, self.model_index
-            )
+            attrs["raw"] = self._accessor.value(self.coordinator.data[self.model_id])
         return attrs
 
 
@@ -302,3 +378,28 @@ class SunSpecEnergySensor(SunSpecSensor, RestoreSensor):
             self.last_known_value = state.native_value
         else:
             _LOGGER.debug(f"{self.name} No previous state was found")
+
+
+class SunSpecPollSensor(SunSpecEntity, SensorEntity):
+    """Diagnostic sensor showing what polling the device costs"""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_icon = "mdi:timer-outline"
+
+    def __init__(self, coordinator, config_entry, key, prefix):
+        super().__init__(coordinator, config_entry, coordinator.device.group_meta)
+        self.key = key
+        name, self._attr_native_unit_of_measurement, self._attr_state_class = (
+            POLL_SENSORS[key]
+        )
+        self._attr_name = name if prefix == "" else f"{prefix} {name}"
+        self._attr_unique_id = f"{config_entry.entry_id}_poll_{key}"
+
+    @property
+    def assumed_state(self):
+        # Failed cycles are measured too
+        return False
+
+    @property
+    def native_value(self):
+        return self.coordinator.api.stats.summary().get(self.key)
@@ -0,0 +1,193 @@
+"""Poll cycle statistics for SunSpec."""
+
+import bisect
+from collections import deque
+import time
+
+# Upper bounds in milliseconds of the histogram buckets
+LATENCY_BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+# Number of finished cycles kept for the diagnostics download
+CYCLE_HISTORY = 20
+COUNTERS = ("requests", "registers", "retries", "reconnects", "timeouts", "overruns")
+
+
+class Histogram:
+    """Counts of millisecond values per bucket"""
+
+    def __init__(self, bounds=LATENCY_BUCKETS) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+
+    def add(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+
+    def as_dict(self) -> dict:
+        buckets = {
+            f"<={bound}ms": count for bound, count in zip(self.bounds, self.counts)
+        }
+        buckets[f">{self.bounds[-1]}ms"] = self.counts[-1]
+        return buckets
+
+
+class CycleStats:
+    """What one poll cycle cost"""
+
+    def __init__(self) -> None:
+        self.started = time.monotonic()
+        self.duration = None
+        self.interval = None
+        self.success = None
+        self.requests = 0
+        self.registers = 0
+        self.retries = 0
+        self.reconnects = 0
+        self.timeouts = 0
+        self.overruns = 0
+        self.pacing = 0.0
+        # Read time and register count per model id
+        self.models = {}
+
+    @property
+    def budget(self) -> float:
+        """Share of the update interval the cycle took, in percent"""
+        if not self.interval or self.duration is None:
+            return None
+        return round(self.duration / self.interval * 100, 1)
+
+    def as_dict(self) -> dict:
+        return {
+            "duration_ms": _ms(self.duration),
+            "interval_s": self.interval,
+            "budget_pct": self.budget,
+            "success": self.success,
+            **{counter: getattr(self, counter) for counter in COUNTERS},
+            "pacing_ms": _ms(self.pacing),
+            "models": {
+                model_id: {"latency_ms": _ms(latency), "registers": registers}
+                for model_id, (latency, registers) in sorted(self.models.items())
+            },
+        }
+
+
+class PollStats:
+    """Request, model and cycle statistics of one device
+
+    Requests made between two cycles, like discovery, count towards the next one.
+    """
+
+    def __init__(self) -> None:
+        self.cycle = CycleStats()
+        self.last_cycle = None
+        self.history = deque(maxlen=CYCLE_HISTORY)
+        self.cycles = 0
+        self.failures = 0
+        self.totals = dict.fromkeys(COUNTERS, 0)
+        self.request_latency = Histogram()
+        self.cycle_duration = Histogram()
+        self.model_latency = {}
+
+    def start_cycle(self):
+        self.cycle = CycleStats()
+
+    def end_cycle(self, success: bool, interval: float):
+        cycle = self.cycle
+        cycle.duration = time.monotonic() - cycle.started
+        cycle.interval = interval
+        cycle.success = success
+        self.cycles += 1
+        if not success:
+            self.failures += 1
+        for counter in COUNTERS:
+            self.totals[counter] += getattr(cycle, counter)
+        self.cycle_duration.add(cycle.duration * 1000)
+        self.last_cycle = cycle
+        self.history.append(cycle)
+        self.cycle = CycleStats()
+
+    def record_request(self, elapsed: float):
+        self.cycle.requests += 1
+        self.request_latency.add(elapsed * 1000)
+
+    def record_timeout(self):
+        self.cycle.timeouts += 1
+
+    def record_retry(self):
+        self.cycle.retries += 1
+
+    def record_reconnect(self):
+        self.cycle.reconnects += 1
+
+    def record_overrun(self):
+        self.cycle.overruns += 1
+
+    def record_pacing(self, delay: float):
+        self.cycle.pacing += delay
+
+    def record_model(self, model_id: int, latency: float, registers: int):
+        previous = self.cycle.models.get(model_id, (0.0, 0))
+        self.cycle.models[model_id] = (
+            previous[0] + latency,
+            previous[1] + registers,
+        )
+        histogram = self.model_latency.get(model_id)
+        if histogram is None:
+            histogram = self.model_latency[model_id] = Histogram()
+        histogram.add(latency * 1000)
+
+    def record_reads(self, models, spans, reads):
+        """Attribute the time of (address, count, elapsed) reads to the models in them
+
+        spans holds the (address, count) ranges read of each model. A read
+        covering several models is shared in proportion to their registers.
+        """
+        for _, count, _ in reads:
+            self.cycle.registers += count
+        for model, ranges in zip(models, spans):
+            latency = 0.0
+            for addr, count in ranges:
+                for start, length, elapsed in reads:
+                    overlap = min(addr + count, start + length) - max(addr, start)
+                    if overlap > 0:
+                        latency += elapsed * overlap / length
+            self.record_model(
+                model.model_id, latency, sum(count for _, count in ranges)
+            )
+
+    def summary(self) -> dict:
+        """Values of the poll diagnostic sensors"""
+        cycle = self.last_cycle
+        if cycle is None:
+            return {}
+        return {
+            "cycle_duration": _ms(cycle.duration),
+            "cycle_budget": cycle.budget,
+            "requests": cycle.requests,
+            "registers": cycle.registers,
+            "pacing": _ms(cycle.pacing),
+            "retries": self.totals["retries"],
+            "reconnects": self.totals["reconnects"],
+            "timeouts": self.totals["timeouts"],
+        }
+
+    def as_dict(self) -> dict:
+        return {
+            "cycles": self.cycles,
+            "failures": self.failures,
+            "totals": dict(self.totals),
+            "last_cycle": (
+                None if self.last_cycle is None else self.last_cycle.as_dict()
+            ),
+            "history": [cycle.as_dict() for cycle in self.history],
+            "histograms": {
+                "request_latency": self.request_latency.as_dict(),
+                "cycle_duration": self.cycle_duration.as_dict(),
+                "model_latency": {
+                    model_id: histogram.as_dict()
+                    for model_id, histogram in sorted(self.model_latency.items())
+                },
+            },
+        }
+
+
+def _ms(seconds) -> float:
+    return None if seconds is None else round(seconds * 1000, 1)
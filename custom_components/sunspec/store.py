@@ -0,0 +1,48 @@
+"""Persistent per device state for SunSpec."""
+
+import asyncio
+
+from homeassistant.core import HomeAssistant
+from homeassistant.core import callback
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+from .const import DOMAIN_DATA
+
+STORAGE_KEY = f"{DOMAIN}.devices"
+STORAGE_VERSION = 1
+SAVE_DELAY = 30
+
+
+class SunSpecDeviceStore:
+    """State learned about devices, keyed by host:port:unit_id"""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self.devices = {}
+
+    async def async_load(self):
+        data = await self._store.async_load()
+        if data is not None:
+            self.devices = data.get("devices", {})
+
+    def device(self, key) -> dict:
+        return self.devices.setdefault(key, {})
+
+    @callback
+    def async_save(self):
+        self._store.async_delay_save(lambda: {"devices": self.devices}, SAVE_DELAY)
+
+
+async def async_get_store(hass: HomeAssistant) -> SunSpecDeviceStore:
+    """Get the device store, loading it on first use"""
+    domain_data = hass.data.setdefault(DOMAIN_DATA, {})
+    if "store" not in domain_data:
+        domain_data["store"] = asyncio.ensure_future(_async_load_store(hass))
+    return await domain_data["store"]
+
+
+async def _async_load_store(hass: HomeAssistant) -> SunSpecDeviceStore:
+    store = SunSpecDeviceStore(hass)
+    await store.async_load()
+    return store
@@ -0,0 +1,296 @@
+"""Modbus TCP transport running on the Home Assistant event loop."""
+
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+import heapq
+import itertools
+import logging
+import struct
+import time
+
+from sunspec2.modbus.modbus import FUNC_READ_HOLDING
+from sunspec2.modbus.modbus import ModbusClientError
+from sunspec2.modbus.modbus import ModbusClientException
+from sunspec2.modbus.modbus import ModbusClientTimeout
+from sunspec2.modbus.modbus import REQ_COUNT_MAX
+
+_LOGGER: logging.Logger = logging.getLogger(__package__)
+
+MBAP_HEADER = struct.Struct(">HHHB")
+# Number of recent response times request timeouts are derived from
+RTT_SAMPLES = 50
+RTT_MIN_SAMPLES = 5
+RTT_PERCENTILE = 0.95
+# Allow responses this many times slower than the slow ones seen recently
+RTT_TIMEOUT_FACTOR = 4
+# Bounds and step size in seconds for the learned delay between two requests
+PACING_DELAY_MAX = 2.0
+PACING_DELAY_STEP = 0.1
+# A response this many times slower than usual means the device is struggling
+PACING_SLOW_FACTOR = 3
+PACING_SLOW_MIN = 0.25
+# Request priorities, lower goes first: UI flows, live values, static models
+PRIORITY_INTERACTIVE = 0
+PRIORITY_TELEMETRY = 1
+PRIORITY_BACKGROUND = 2
+# Exception codes of a gateway whose target device did not answer
+GATEWAY_EXCEPTIONS = (10, 11)
+
+
+class ModbusGatewayException(ModbusClientException):
+    """Exception response of a gateway on behalf of a device that did not answer"""
+
+
+class ResponseTimer:
+    """Derives request timeouts from the response times of a connection
+
+    The timeout is a multiple of a high percentile of recent response times,
+    kept between floor and ceiling. The ceiling is used until enough responses
+    were seen. Timeouts count as responses that took the whole timeout, so it
+    grows again while a device keeps timing out.
+    """
+
+    def __init__(self, floor: float, ceiling: float) -> None:
+        self.floor = floor
+        self.ceiling = ceiling
+        self._samples = deque(maxlen=RTT_SAMPLES)
+
+    @property
+    def timeout(self) -> float:
+        if len(self._samples) < RTT_MIN_SAMPLES:
+            return self.ceiling
+        ordered = sorted(self._samples)
+        rtt = ordered[min(len(ordered) - 1, int(len(ordered) * RTT_PERCENTILE))]
+        return min(self.ceiling, max(self.floor, rtt * RTT_TIMEOUT_FACTOR))
+
+    def record(self, elapsed: float):
+        self._samples.append(elapsed)
+
+
+class RequestPacer:
+    """Learns the delay a connection needs between two Modbus requests
+
+    Starts without any delay, backs off on timeouts and unusually slow
+    responses and speeds up again while the devices keep up.
+    """
+
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.response_time = None
+
+    def record_response(self, elapsed: float):
+        average = self.response_time
+        if average is None:
+            self.response_time = elapsed
+            return
+        self.response_time = average * 0.8 + elapsed * 0.2
+        if elapsed > max(average * PACING_SLOW_FACTOR, PACING_SLOW_MIN):
+            self.delay = min(PACING_DELAY_MAX, self.delay + PACING_DELAY_STEP)
+        elif self.delay > PACING_DELAY_STEP / 10:
+            self.delay *= 0.95
+        else:
+            self.delay = 0.0
+
+    def record_timeout(self):
+        self.delay = min(PACING_DELAY_MAX, max(PACING_DELAY_STEP, self.delay * 2))
+
+
+class PriorityLock:
+    """Lock handed to waiters by priority, lowest first, then in arrival order"""
+
+    def __init__(self) -> None:
+        self._locked = False
+        self._waiters = []
+        self._order = itertools.count()
+
+    def locked(self) -> bool:
+        return self._locked
+
+    @asynccontextmanager
+    async def hold(self, priority: int):
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, priority: int):
+        if not self._locked and not self._waiters:
+            self._locked = True
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._order), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The lock was handed over as the wait was cancelled
+                self.release()
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                # The lock passes on without being unlocked in between
+                future.set_result(None)
+                return
+        self._locked = False
+
+
+class ModbusTcpTransport:
+    """Asyncio Modbus TCP client
+
+    One transport is shared by all units behind the same host and port, requests
+    are addressed by unit id and run one at a time, by priority. Raises the same
+    exceptions as the sunspec2 TCP client so callers can handle both transports
+    alike.
+
+    Requests time out after a time learned from earlier responses, between
+    min_timeout and timeout. They are spaced out by the delay the pacer learns,
+    waited while holding the connection so it separates transactions on the bus.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        timeout: float,
+        connect_timeout: float = None,
+        min_timeout: float = None,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.timer = ResponseTimer(
+            timeout if min_timeout is None else min_timeout, timeout
+        )
+        self.connect_timeout = timeout if connect_timeout is None else connect_timeout
+        self.pacer = RequestPacer()
+        self._reader = None
+        self._writer = None
+        self._transaction_id = 0
+        self._lock = PriorityLock()
+        self._close_requested = False
+        self.last_used = None
+        # Whether each device using this transport keeps it open, by device key
+        self.users = {}
+
+    @property
+    def keep_alive(self) -> bool:
+        """Whether a device using the connection keeps it open between polls"""
+        return any(self.users.values())
+
+    @property
+    def connected(self) -> bool:
+        return (
+            self._writer is not None
+            and not self._writer.is_closing()
+            and not self._reader.at_eof()
+        )
+
+    async def connect(self):
+        self._close()
+        _LOGGER.debug("Opening Modbus TCP connection to %s:%s", self.host, self.port)
+        try:
+            self._reader, self._writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port), self.connect_timeout
+            )
+        except asyncio.TimeoutError as err:
+            raise ModbusClientTimeout(f"Connection timeout: {err}") from err
+        except OSError as err:
+            raise ModbusClientError(f"Connection error: {err}") from err
+
+    async def open(self, priority: int = PRIORITY_TELEMETRY):
+        """Connect unless connected, without disturbing a request in flight"""
+        async with self._lock.hold(priority):
+            if not self.connected:
+                await self.connect()
+
+    def close(self):
+        """Close the connection, after the request in flight if there is one"""
+        if self._lock.locked():
+            self._close_requested = True
+        else:
+            self._close()
+
+    def _close(self):
+        self._close_requested = False
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = None
+        self._writer = None
+
+    async def read(
+        self,
+        unit_id: int,
+        addr: int,
+        count: int,
+        priority: int = PRIORITY_TELEMETRY,
+        stats=None,
+    ) -> bytes:
+        """Read holding registers, connecting first if needed
+
+        The pacing, response time and timeouts of the request are recorded in
+        stats if given.
+        """
+        if count > REQ_COUNT_MAX:
+            raise ValueError(f"Cannot read {count} registers in one request")
+        async with self._lock.hold(priority):
+            delay = self.pacer.delay
+            if delay > 0:
+                if stats is not None:
+                    stats.record_pacing(delay)
+                await asyncio.sleep(delay)
+            if not self.connected:
+                await self.connect()
+            self._transaction_id = (self._transaction_id + 1) & 0xFFFF
+            transaction_id = self._transaction_id
+            request = MBAP_HEADER.pack(transaction_id, 0, 6, unit_id) + struct.pack(
+                ">BHH", FUNC_READ_HOLDING, addr, count
+            )
+            timeout = self.timer.timeout
+            start = time.monotonic()
+            try:
+                self._writer.write(request)
+                response_id, pdu = await asyncio.wait_for(self._response(), timeout)
+                if response_id != transaction_id:
+                    raise ModbusClientError(
+                        f"Unexpected transaction id {response_id}, expected {transaction_id}"
+                    )
+                elapsed = time.monotonic() - start
+                self.timer.record(elapsed)
+                self.pacer.record_response(elapsed)
+                if stats is not None:
+                    stats.record_request(elapsed)
+            except asyncio.TimeoutError as err:
+                self._close()
+                self.timer.record(timeout)
+                self.pacer.record_timeout()
+                if stats is not None:
+                    stats.record_timeout()
+                raise ModbusClientTimeout("Response timeout") from err
+            except (asyncio.IncompleteReadError, OSError) as err:
+                self._close()
+                raise ModbusClientError(f"Socket error: {err}") from err
+            except ModbusClientError:
+                self._close()
+                raise
+            finally:
+                self.last_used = time.monotonic()
+                if self._close_requested:
+                    self._close()
+
+        if pdu[0] & 0x80:
+            exception = (
+                ModbusGatewayException
+                if pdu[1] in GATEWAY_EXCEPTIONS
+                else ModbusClientException
+            )
+            raise exception(f"Modbus exception {pdu[1]}: addr: {addr} count: {count}")
+        return pdu[2 : 2 + pdu[1]]
+
+    async def _response(self):
+        header = await self._reader.readexactly(MBAP_HEADER.size)
+        response_id, _, length, _ = MBAP_HEADER.unpack(header)
+        return response_id, await self._reader.readexactly(length - 1)
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import struct
 from typing import Any
 from unittest.mock import Mock
 from unittest.mock import patch
@@ -15,6 +16,8 @@ from pytest_homeassistant_custom_component.common import MockConfigEntry
 from custom_components.sunspec import DOMAIN
 from custom_components.sunspec import get_sunspec_unique_id
 from custom_components.sunspec.api import SunSpecApiClient
+from custom_components.sunspec.decode import STRUCT_CODES
+from custom_components.sunspec.decode import UNIMPLEMENTED
 
 from .const import MOCK_CONFIG
 
@@ -31,6 +34,7 @@ TEST_INVERTER_RG_SENSOR_INCLX_ENTITY_ID = (
 )
 TEST_INVERTER_SENSOR_DC_ENTITY_ID = "sensor.mppt_module_0_dc_current"
 TEST_INVERTER_PREFIX_SENSOR_DC_ENTITY_ID = "sensor.test_mppt_module_0_dc_current"
+TEST_POLL_SENSOR_DURATION_ENTITY_ID = "sensor.poll_cycle_duration"
 
 
 def create_mock_sunspec_client(hass: HomeAssistant):
@@ -75,6 +79,25 @@ async def setup_mock_sunspec_config_entry(
     return config_entry
 
 
+def unimplemented_registers(group) -> bytes:
+    """Registers of a group instance holding only unimplemented values"""
+    data = b""
+    for point in group.points.values():
+        ptype = point.pdef["type"]
+        code = STRUCT_CODES.get(ptype)
+        if code is None or UNIMPLEMENTED.get(ptype) is None:
+            data += bytes(int(point.len) * 2)
+        else:
+            data += struct.pack(f">{code}", UNIMPLEMENTED[ptype])
+    return data
+
+
+def set_point_value(wrapper, key: str, value) -> None:
+    """Change a point value of decoded model data"""
+    decoder, values = wrapper._tables[0]
+    values[decoder.positions[key]] = value
+
+
 def register_test_entity(
     hass: HomeAssistant,
     platform: str,
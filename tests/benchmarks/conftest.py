@@ -0,0 +1,140 @@
+"""Fixtures for SunSpec benchmarks."""
+
+import json
+from pathlib import Path
+import platform
+import statistics
+import time
+from unittest.mock import patch
+
+import pytest
+
+from custom_components.sunspec.api import SunSpecApiClient
+
+from ..conftest import MockModbusClientDevice
+from ..conftest import redirect_transports
+from ..simulator import SimulatedDevice
+from ..simulator import SunSpecSimulator
+
+BASELINE = Path(__file__).parent / "baseline.json"
+# Number of devices and extra copies of the large models in the synthetic setup
+DEVICES = 4
+MODEL_COPIES = 4
+LARGE_MODELS = (160, 701)
+
+
+def pytest_collection_modifyitems(config, items):
+    """Benchmarks only run when asked for"""
+    if config.getoption("--benchmark"):
+        return
+    skip = pytest.mark.skip(reason="benchmarks only run with --benchmark")
+    for item in items:
+        if Path(__file__).parent in item.path.parents:
+            item.add_marker(skip)
+
+
+class Benchmark:
+    """Time a piece of code and compare it with the stored baseline"""
+
+    def __init__(self, results: dict, baseline: dict, tolerance: float) -> None:
+        self._results = results
+        self._baseline = baseline
+        self._tolerance = tolerance
+
+    def __call__(self, name, func, rounds=10):
+        times = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+        self.record(name, times)
+
+    async def async_run(self, name, func, rounds=10):
+        times = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            await func()
+            times.append(time.perf_counter() - start)
+        self.record(name, times)
+
+    def record(self, name, times):
+        result = {
+            "min": round(min(times), 6),
+            "mean": round(statistics.mean(times), 6),
+            "rounds": len(times),
+        }
+        self._results[name] = result
+        baseline = self._baseline.get(name)
+        if baseline is not None and result["min"] > baseline["min"] * self._tolerance:
+            pytest.fail(
+                f"{name} took {result['min'] * 1000:.2f} ms, "
+                f"baseline is {baseline['min'] * 1000:.2f} ms"
+            )
+
+
+@pytest.fixture(scope="session")
+def benchmark_results(pytestconfig):
+    """Collect the results of all benchmarks, written out at the end of the session"""
+    results = {}
+    yield results
+    if not results:
+        return
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "benchmarks": dict(sorted(results.items())),
+    }
+    path = pytestconfig.getoption("--benchmark-json")
+    if path is not None:
+        Path(path).write_text(json.dumps(report, indent=2) + "\n")
+    if pytestconfig.getoption("--benchmark-save"):
+        BASELINE.write_text(json.dumps(report, indent=2) + "\n")
+
+
+@pytest.fixture
+def benchmark(pytestconfig, benchmark_results):
+    baseline = {}
+    if BASELINE.exists() and not pytestconfig.getoption("--benchmark-save"):
+        baseline = json.loads(BASELINE.read_text())["benchmarks"]
+    return Benchmark(
+        benchmark_results, baseline, pytestconfig.getoption("--benchmark-tolerance")
+    )
+
+
+@pytest.fixture(scope="session")
+def synthetic_device_file(tmp_path_factory):
+    """Device image with extra copies of the models with the most points"""
+    image = json.loads(Path("./tests/test_data/inverter.json").read_text())
+    models = image["models"]
+    extra = [model for model in models if model["ID"] in LARGE_MODELS] * MODEL_COPIES
+    # The end marker stays last
+    image["models"] = models[:-1] + extra + models[-1:]
+    path = tmp_path_factory.mktemp("benchmarks") / "device.json"
+    path.write_text(json.dumps(image))
+    return str(path)
+
+
+@pytest.fixture
+async def synthetic_devices(hass, socket_enabled, synthetic_device_file):
+    """Devices behind unit ids 1 and up of a local simulator, scanned up front"""
+    devices = {}
+    for unit_id in range(1, DEVICES + 1):
+        device = MockModbusClientDevice(synthetic_device_file)
+        device.scan(full_model_read=False)
+        devices[unit_id] = device
+    simulator = SunSpecSimulator(
+        {
+            unit_id: SimulatedDevice.from_file(synthetic_device_file)
+            for unit_id in devices
+        }
+    )
+    await simulator.start()
+
+    def modbus_connect(api, config=None):
+        return devices[api._unit_id]
+
+    with patch.object(
+        SunSpecApiClient, "modbus_connect", modbus_connect
+    ), redirect_transports(simulator.port):
+        yield devices
+    await simulator.stop()
@@ -0,0 +1,114 @@
+"""Benchmarks of the SunSpec polling and entity hot paths.
+
+Run with `pytest tests/benchmarks --benchmark`, add `--benchmark-json` to keep
+the results and `--benchmark-save` to store them as the new baseline.
+"""
+
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.helpers import entity_registry as er
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.sunspec.api import SunSpecApiClient
+from custom_components.sunspec.const import CONF_ENABLED_MODELS
+from custom_components.sunspec.const import DOMAIN
+from custom_components.sunspec.sensor import SunSpecSensor
+
+from ..const import MOCK_CONFIG
+
+
+def model_ids(device):
+    return sorted(mid for mid in device.models if type(mid) is int and mid != 1)
+
+
+def create_entries(hass, devices):
+    entries = []
+    for unit_id, device in devices.items():
+        entry = MockConfigEntry(
+            domain=DOMAIN,
+            data={**MOCK_CONFIG, "unit_id": unit_id},
+            options={CONF_ENABLED_MODELS: model_ids(device)},
+            entry_id=f"benchmark_{unit_id}",
+        )
+        entry.add_to_hass(hass)
+        entries.append(entry)
+    return entries
+
+
+async def setup_entries(hass, entries):
+    for entry in entries:
+        # Setting up the integration sets up all of its entries
+        if entry.state is ConfigEntryState.NOT_LOADED:
+            assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+
+
+async def unload_entries(hass, entries):
+    for entry in entries:
+        assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
+    registry = er.async_get(hass)
+    for entry in entries:
+        for entity in er.async_entries_for_config_entry(registry, entry.entry_id):
+            registry.async_remove(entity.entity_id)
+
+
+def sunspec_sensors(hass):
+    return [
+        entity
+        for entity in hass.data["sensor"].entities
+        if isinstance(entity, SunSpecSensor)
+    ]
+
+
+async def test_get_keys(hass, benchmark, synthetic_devices):
+    device = synthetic_devices[1]
+    api = SunSpecApiClient("test_host", 123, 1, hass)
+    data = await api.async_get_models_data(model_ids(device))
+
+    benchmark("get_keys", lambda: [wrapper.getKeys() for wrapper in data.values()])
+
+
+async def test_read_models(hass, benchmark, synthetic_devices):
+    device = synthetic_devices[1]
+    api = SunSpecApiClient("test_host", 123, 1, hass)
+    ids = model_ids(device)
+
+    await benchmark.async_run("read_models", lambda: api.async_get_models_data(ids))
+
+
+async def test_sensor_setup(hass, benchmark, synthetic_devices):
+    entries = create_entries(hass, synthetic_devices)
+    times = []
+    for _ in range(3):
+        start = hass.loop.time()
+        await setup_entries(hass, entries)
+        times.append(hass.loop.time() - start)
+        await unload_entries(hass, entries)
+    benchmark.record("sensor_setup", times)
+
+
+async def test_sensor_state(hass, benchmark, synthetic_devices):
+    await setup_entries(hass, create_entries(hass, synthetic_devices))
+    sensors = sunspec_sensors(hass)
+    assert len(sensors) > 1000
+
+    benchmark(
+        "sensor_state",
+        lambda: [
+            (sensor.native_value, sensor.extra_state_attributes) for sensor in sensors
+        ],
+    )
+
+
+async def test_coordinator_refresh(hass, benchmark, synthetic_devices):
+    entries = create_entries(hass, synthetic_devices)
+    await setup_entries(hass, entries)
+    coordinators = [hass.data[DOMAIN][entry.entry_id] for entry in entries]
+
+    async def refresh():
+        for coordinator in coordinators:
+            # Read every model, not only the ones due
+            coordinator.last_read.clear()
+            await coordinator.async_refresh()
+
+    await benchmark.async_run("coordinator_refresh", refresh)
@@ -8,21 +8,42 @@ from unittest.mock import patch
 
 import pytest
 import sunspec2.file.client as modbus_client
+from sunspec2.modbus.client import SunSpecModbusClientDevice
 
 from custom_components.sunspec.api import ConnectionError
 from custom_components.sunspec.api import ConnectionTimeoutError
 from custom_components.sunspec.api import SunSpecApiClient
+from custom_components.sunspec.transport import ModbusTcpTransport
+
+from .simulator import SimulatedDevice
+from .simulator import SunSpecSimulator
+from .simulator import load_image
 
 pytest_plugins = "pytest_homeassistant_custom_component"
 _LOGGER: logging.Logger = logging.getLogger(__package__)
 
 
-class MockFileClientDeviceNotConnected(modbus_client.FileClientDevice):
-    def is_connected(self):
-        return False
-
-    def connect(self):
-        return True
+def pytest_addoption(parser):
+    group = parser.getgroup("benchmark")
+    group.addoption(
+        "--benchmark",
+        action="store_true",
+        help="Run the benchmarks in tests/benchmarks",
+    )
+    group.addoption(
+        "--benchmark-json", default=None, help="Write the benchmark results to a file"
+    )
+    group.addoption(
+        "--benchmark-save",
+        action="store_true",
+        help="Store the benchmark results as the new baseline",
+    )
+    group.addoption(
+        "--benchmark-tolerance",
+        type=float,
+        default=2.0,
+        help="Fail benchmarks this many times slower than the baseline",
+    )
 
 
 class MockFileClientDevice(modbus_client.FileClientDevice):
@@ -40,6 +61,21 @@ class MockFileClientDevice(modbus_client.FileClientDevice):
         return True
 
 
+class MockModbusClientDevice(SunSpecModbusClientDevice):
+    """Modbus device serving the registers of a json device image."""
+
+    def __init__(self, filename, base_addr=40000):
+        super().__init__()
+        self.registers = load_image(filename)
+        self.image_addr = base_addr
+        self.requests = []
+
+    def read(self, addr, count, op=None):
+        self.requests.append((int(addr), int(count)))
+        offset = (int(addr) - self.image_addr) * 2
+        return self.registers[offset : offset + int(count) * 2]
+
+
 # This fixture is used to prevent HomeAssistant from attempting to create and dismiss persistent
 # notifications. These calls would fail without this fixture since the persistent_notification
 # integration is never loaded during a test.
@@ -63,8 +99,14 @@ def auto_enable_custom_integrations(
 def clear_sunspec_client_cache():
     """Avoid cross-test reuse of cached clients with different fixture behavior."""
     SunSpecApiClient.CLIENT_CACHE = {}
+    SunSpecApiClient.TRANSPORT_CACHE = {}
+    SunSpecApiClient.SHARED_REQUESTS = {}
+    SunSpecApiClient.SHARED_RESULTS = {}
     yield
     SunSpecApiClient.CLIENT_CACHE = {}
+    SunSpecApiClient.TRANSPORT_CACHE = {}
+    SunSpecApiClient.SHARED_REQUESTS = {}
+    SunSpecApiClient.SHARED_RESULTS = {}
 
 
 # This fixture, when used, will result in calls to async_get_data to return None. To have the call
@@ -85,17 +127,30 @@ def bypass_get_data_fixture():
         yield
 
 
+def redirect_transports(port):
+    """Connect the transports of the api to a local port, whatever the host and port"""
+
+    def transport(host, _port, *args, **kwargs):
+        return ModbusTcpTransport("127.0.0.1", port, *args, **kwargs)
+
+    return patch("custom_components.sunspec.api.ModbusTcpTransport", transport)
+
+
 @pytest.fixture
-def sunspec_client_mock():
-    """Skip calls to get data from API."""
-    client = MockFileClientDevice("./tests/test_data/inverter.json")
-    client.scan()
-    with patch(
-        "custom_components.sunspec.SunSpecApiClient.modbus_connect", return_value=client
-    ), patch(
-        "custom_components.sunspec.SunSpecApiClient.check_port", return_value=True
-    ):
-        yield
+async def modbus_server(hass, socket_enabled):
+    """Serve the test device image over Modbus TCP on localhost."""
+    device = SimulatedDevice.from_file("./tests/test_data/inverter.json")
+    server = SunSpecSimulator({unit_id: device for unit_id in (1, 2, 3)})
+    await server.start()
+    yield server
+    await server.stop()
+
+
+@pytest.fixture
+def sunspec_client_mock(modbus_server):
+    """Discover and read the test device from the simulator."""
+    with redirect_transports(modbus_server.port):
+        yield modbus_server
 
 
 # In this fixture, we are forcing calls to async_get_data to raise an Exception. This is useful
@@ -106,8 +161,6 @@ def sunspec_client_mock_connect_error():
     client = MockFileClientDevice("./tests/test_data/inverter.json")
     with patch(
         "custom_components.sunspec.SunSpecApiClient.modbus_connect", return_value=client
-    ), patch(
-        "custom_components.sunspec.SunSpecApiClient.check_port", return_value=True
     ), patch(
         "custom_components.sunspec.SunSpecApiClient.async_get_models",
         side_effect=ConnectionError,
@@ -115,31 +168,6 @@ def sunspec_client_mock_connect_error():
         yield
 
 
-@pytest.fixture
-def sunspec_client_mock_not_connected():
-    """Skip calls to get data from API."""
-    client = MockFileClientDeviceNotConnected("./tests/test_data/inverter.json")
-    client.scan()
-    with patch(
-        "custom_components.sunspec.SunSpecApiClient.modbus_connect", return_value=client
-    ), patch(
-        "custom_components.sunspec.SunSpecApiClient.check_port", return_value=True
-    ):
-        yield
-
-
-@pytest.fixture(name="sunspec_modbus_client_mock")
-def sunspec_modbus_client_mock():
-    """Skip calls to get data from API."""
-    mock = Mock()
-    with patch(
-        "sunspec2.modbus.client.SunSpecModbusClientDeviceTCP", return_value=mock
-    ), patch(
-        "custom_components.sunspec.SunSpecApiClient.check_port", return_value=True
-    ):
-        yield
-
-
 # In this fixture, we are forcing calls to async_get_data to raise an Exception. This is useful
 # for exception handling.
 @pytest.fixture(name="error_on_get_device_info")
@@ -148,8 +176,6 @@ def error_get_device_info_fixture():
     with patch(
         "custom_components.sunspec.SunSpecApiClient.async_get_device_info",
         side_effect=Exception,
-    ), patch(
-        "custom_components.sunspec.SunSpecApiClient.check_port", return_value=True
     ):
         yield
 
@@ -160,8 +186,6 @@ def timeout_get_device_info_fixture():
     with patch(
         "custom_components.sunspec.SunSpecApiClient.async_get_device_info",
         side_effect=ConnectionTimeoutError,
-    ), patch(
-        "custom_components.sunspec.SunSpecApiClient.check_port", return_value=True
     ):
         yield
 
@@ -191,9 +215,7 @@ def error_on_get_data():
     with patch(
         "custom_components.sunspec.SunSpecApiClient.modbus_connect", return_value=client
     ), patch(
-        "custom_components.sunspec.SunSpecApiClient.check_port", return_value=True
-    ), patch(
-        "custom_components.sunspec.SunSpecApiClient.async_get_data",
+        "custom_components.sunspec.SunSpecApiClient.async_get_models_data",
         side_effect=ConnectionError,
     ):
         yield
@@ -209,9 +231,7 @@ def timeout_error_on_get_data():
     with patch(
         "custom_components.sunspec.SunSpecApiClient.get_client", return_value=client
     ), patch(
-        "custom_components.sunspec.SunSpecApiClient.check_port", return_value=True
-    ), patch(
-        "custom_components.sunspec.SunSpecApiClient.async_get_data",
+        "custom_components.sunspec.SunSpecApiClient.async_get_models_data",
         side_effect=ConnectionTimeoutError,
     ):
         yield
@@ -227,9 +247,7 @@ def connect_error_on_get_data():
     with patch(
         "custom_components.sunspec.SunSpecApiClient.modbus_connect", return_value=client
     ), patch(
-        "custom_components.sunspec.SunSpecApiClient.check_port", return_value=True
-    ), patch(
-        "custom_components.sunspec.SunSpecApiClient.async_get_data",
+        "custom_components.sunspec.SunSpecApiClient.async_get_models_data",
         side_effect=ConnectionError,
     ):
         yield
@@ -239,13 +257,14 @@ def connect_error_on_get_data():
 def overflow_error_dca():
     """Simulate overflow error for getValue from API."""
 
-    def my_side_effect(*args, **kwargs):
-        if args[0] == "DCA":
+    def my_side_effect(accessor, wrapper):
+        if accessor.key == "DCA":
             raise OverflowError()
         return 1
 
     with patch(
-        "custom_components.sunspec.api.SunSpecModelWrapper.getValue",
+        "custom_components.sunspec.api.PointAccessor.value",
+        autospec=True,
         side_effect=my_side_effect,
     ):
         yield
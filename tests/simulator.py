@@ -0,0 +1,211 @@
+"""SunSpec Modbus TCP simulator.
+
+Serves SunSpec device images, in the json format of tests/test_data, over Modbus
+TCP with configurable latency and faults. Used by the tests and for load testing
+polling without hardware:
+
+    python -m tests.simulator tests/test_data/inverter.json --units 50 --latency 0.03
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import struct
+
+import sunspec2.file.client as file_client
+
+_LOGGER: logging.Logger = logging.getLogger(__name__)
+
+MBAP_HEADER = struct.Struct(">HHHB")
+FUNC_READ_HOLDING = 3
+EXCEPTION_ILLEGAL_ADDRESS = 2
+EXCEPTION_GATEWAY_TARGET = 11
+BASE_ADDR = 40000
+
+
+def load_image(filename) -> bytes:
+    """Register image of a json device, starting with the SunS marker"""
+    image = file_client.FileClientDevice(filename)
+    image.scan()
+    return (
+        b"SunS"
+        + b"".join(model.get_mb() for model in image.model_list)
+        + b"\xff\xff\x00\x00"
+    )
+
+
+class SimulatedDevice:
+    """Holding registers of one device"""
+
+    def __init__(self, registers: bytes, base_addr: int = BASE_ADDR) -> None:
+        self.registers = registers
+        self.base_addr = base_addr
+        self.requests = []
+
+    @classmethod
+    def from_file(cls, filename, base_addr: int = BASE_ADDR):
+        return cls(load_image(filename), base_addr)
+
+    def read(self, addr: int, count: int) -> bytes:
+        """Registers at addr, short if the range is not implemented"""
+        self.requests.append((addr, count))
+        if addr < self.base_addr:
+            return b""
+        offset = (addr - self.base_addr) * 2
+        return self.registers[offset : offset + count * 2]
+
+    def write(self, addr: int, data: bytes):
+        """Change registers from addr, like the device itself does"""
+        offset = (addr - self.base_addr) * 2
+        self.registers = (
+            self.registers[:offset] + data + self.registers[offset + len(data) :]
+        )
+
+
+class SunSpecSimulator:
+    """Modbus TCP server answering holding register reads of simulated devices
+
+    Devices are addressed by unit id, other unit ids get a gateway exception.
+    Faults are injected per request with the given probabilities. The session
+    delay holds back the first request of each connection, like a gateway slow
+    to open its session. The kernel completes the TCP handshake on its own, so
+    it cannot make a connect time out.
+    """
+
+    def __init__(
+        self,
+        devices: dict,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        timeout_rate: float = 0.0,
+        drop_rate: float = 0.0,
+        session_delay: float = 0.0,
+        serial: bool = False,
+        seed=None,
+    ) -> None:
+        self.devices = devices
+        self.latency = latency
+        self.jitter = jitter
+        self.timeout_rate = timeout_rate
+        self.drop_rate = drop_rate
+        self.session_delay = session_delay
+        self.connections = 0
+        self.requests = 0
+        self.unit_ids = set()
+        self.port = None
+        self._random = random.Random(seed)
+        # Like an RS485 gateway, answer one request at a time
+        self._bus = asyncio.Lock() if serial else None
+        self._server = None
+        self._writers = set()
+        # Handlers still holding back the session of a new connection
+        self._opening = set()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0):
+        self._server = await asyncio.start_server(self._handle, host, port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.drop_connections()
+        self._server.close()
+        await self._server.wait_closed()
+
+    def drop_connections(self):
+        for writer in list(self._writers):
+            writer.close()
+        for task in list(self._opening):
+            task.cancel()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        self._writers.add(writer)
+        try:
+            if self.session_delay:
+                self._opening.add(asyncio.current_task())
+                try:
+                    await asyncio.sleep(self.session_delay)
+                finally:
+                    self._opening.discard(asyncio.current_task())
+            while True:
+                header = await reader.readexactly(MBAP_HEADER.size)
+                transaction_id, _, length, unit_id = MBAP_HEADER.unpack(header)
+                pdu = await reader.readexactly(length - 1)
+                self.requests += 1
+                self.unit_ids.add(unit_id)
+                if self._random.random() < self.drop_rate:
+                    break
+                if self._random.random() < self.timeout_rate:
+                    continue
+                if self._bus is None:
+                    response = await self._respond(unit_id, pdu)
+                else:
+                    async with self._bus:
+                        response = await self._respond(unit_id, pdu)
+                writer.write(
+                    MBAP_HEADER.pack(transaction_id, 0, len(response) + 1, unit_id)
+                    + response
+                )
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _respond(self, unit_id, pdu) -> bytes:
+        delay = self.latency + self._random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        func, addr, count = struct.unpack(">BHH", pdu[:5])
+        device = self.devices.get(unit_id)
+        if device is None:
+            return struct.pack(">BB", func | 0x80, EXCEPTION_GATEWAY_TARGET)
+        data = device.read(addr, count) if func == FUNC_READ_HOLDING else b""
+        if len(data) < count * 2:
+            return struct.pack(">BB", func | 0x80, EXCEPTION_ILLEGAL_ADDRESS)
+        return struct.pack(">BB", func, len(data)) + data
+
+
+async def serve(args):
+    registers = load_image(args.image)
+    simulator = SunSpecSimulator(
+        {
+            unit_id: SimulatedDevice(registers)
+            for unit_id in range(args.first_unit, args.first_unit + args.units)
+        },
+        latency=args.latency,
+        jitter=args.jitter,
+        timeout_rate=args.timeout_rate,
+        drop_rate=args.drop_rate,
+        session_delay=args.session_delay,
+        serial=args.serial,
+    )
+    await simulator.start(args.host, args.port)
+    _LOGGER.info(
+        "Serving %s units of %s on %s:%s", args.units, args.image, args.host, args.port
+    )
+    await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("image", help="json device image")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5020)
+    parser.add_argument("--units", type=int, default=1, help="number of unit ids")
+    parser.add_argument("--first-unit", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="seconds")
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--session-delay", type=float, default=0.0, help="seconds")
+    parser.add_argument(
+        "--serial", action="store_true", help="answer one request at a time"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(serve(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,37 @@
 """Tests for SunSpec api."""
 
+import asyncio
+import time
+from unittest.mock import patch
+
 import pytest
-from sunspec2.modbus.client import SunSpecModbusClientException
-from sunspec2.modbus.client import SunSpecModbusClientTimeout
+from sunspec2.modbus.client import SunSpecModbusClientError
 from sunspec2.modbus.modbus import ModbusClientError
+from sunspec2.modbus.modbus import ModbusClientException
+from sunspec2.modbus.modbus import ModbusClientTimeout
 
+from custom_components.sunspec.api import CircuitBreaker
 from custom_components.sunspec.api import ConnectionError
 from custom_components.sunspec.api import ConnectionTimeoutError
+from custom_components.sunspec.api import GROUP_RECHECK_INTERVAL
+from custom_components.sunspec.api import KEEP_ALIVE_IDLE_TIMEOUT
+from custom_components.sunspec.api import PointAccessor
+from custom_components.sunspec.api import SHARED_RESULT_FRESHNESS
 from custom_components.sunspec.api import SunSpecApiClient
+from custom_components.sunspec.api import SunSpecModelWrapper
+from custom_components.sunspec.api import extract_range
+from custom_components.sunspec.api import plan_reads
+from custom_components.sunspec.store import async_get_store
+from custom_components.sunspec.transport import ModbusGatewayException
+from custom_components.sunspec.transport import ModbusTcpTransport
+from custom_components.sunspec.transport import PRIORITY_BACKGROUND
+from custom_components.sunspec.transport import PRIORITY_INTERACTIVE
+
+from . import unimplemented_registers
+from .conftest import MockModbusClientDevice
+from .simulator import BASE_ADDR
+from .simulator import SimulatedDevice
+from .simulator import SunSpecSimulator
 
 
 async def test_api(hass, sunspec_client_mock):
@@ -41,6 +65,11 @@ async def test_api(hass, sunspec_client_mock):
     assert device_info.getValue("Mn") == "SunSpecTest"
     assert device_info.getValue("SN") == "sn-123456789"
 
+    # The identity comes from the scan
+    record = await api.async_get_device_record()
+    assert record.manufacturer == "SunSpecTest"
+    assert record.group_meta["name"] == "common"
+
     model = await api.async_get_data(701)
     assert model.getValue("W") == 9800
     assert model.getMeta("W")["label"] == "Active Power"
@@ -50,91 +79,709 @@ async def test_api(hass, sunspec_client_mock):
     assert len(keys) == 22
 
 
-async def test_get_client(hass, sunspec_modbus_client_mock):
-    SunSpecApiClient.CLIENT_CACHE = {}
-    """Test API calls."""
+async def test_shared_requests(hass, sunspec_client_mock, mocker):
+    apis = [SunSpecApiClient(host="test", port=123, unit_id=1, hass=hass)] * 2
+    apis.append(SunSpecApiClient(host="test", port=123, unit_id=1, hass=hass))
+    read = mocker.spy(SunSpecApiClient, "read")
+    get_client = mocker.spy(SunSpecApiClient, "get_client")
+
+    # Concurrent callers for the same unit share one request and its result
+    models = await asyncio.gather(*[api.async_get_models() for api in apis])
+    assert models[0] == models[2]
+    assert get_client.call_count == 1
+    # Requests that are never reused leave no result behind
+    assert ("test:123:1", "client") not in SunSpecApiClient.SHARED_RESULTS
+    first, second, third = await asyncio.gather(
+        apis[0].async_get_device_info(),
+        apis[1].async_get_data(1),
+        apis[2].async_get_device_info(),
+    )
+    assert first is second is third
+    assert read.call_count == 1
+
+    # Recent results are reused, the cached client without the executor
+    assert await apis[2].async_get_data(1) is first
+    assert read.call_count == 1
+    await apis[0].async_get_models()
+    assert get_client.call_count == 1
+
+    key = ("test:123:1", ("read", 1))
+    SunSpecApiClient.SHARED_RESULTS[key] = (
+        time.monotonic() - SHARED_RESULT_FRESHNESS,
+        first,
+    )
+    assert await apis[0].async_get_device_info() is not first
+    assert read.call_count == 2
+    assert SunSpecApiClient.SHARED_REQUESTS == {}
+
+    # Failures are not reused and a caller giving up leaves the others waiting
+    with patch.object(
+        SunSpecApiClient, "read", side_effect=ModbusClientException
+    ), pytest.raises(ConnectionError):
+        await apis[0].async_get_data(701)
+    assert ("test:123:1", ("read", 701)) not in SunSpecApiClient.SHARED_RESULTS
+    impatient = asyncio.create_task(apis[0].async_get_data(701))
+    patient = asyncio.create_task(apis[1].async_get_data(701))
+    await asyncio.sleep(0)
+    impatient.cancel()
+    assert (await patient).getValue("W") == 9800
+
+    # Nothing is kept for a disconnected client
+    in_flight = asyncio.create_task(apis[0].async_get_data(103))
+    await asyncio.sleep(0)
+    apis[0].disconnect()
+    assert SunSpecApiClient.SHARED_REQUESTS == {}
+    assert SunSpecApiClient.SHARED_RESULTS == {}
+    await in_flight
+    assert SunSpecApiClient.SHARED_RESULTS == {}
+
+
+async def test_get_client(hass, modbus_server):
+    api = SunSpecApiClient("127.0.0.1", modbus_server.port, 1, hass)
+    client = await api.async_get_client()
+    assert 160 in client.models
+    assert await api.async_get_client() is client
+    # Every request of the scan is paced and counted on its own
+    assert api.stats.cycle.requests == len(modbus_server.devices[1].requests)
+    assert api.pacer.response_time is not None
+
+    # Discovery and polling share the connection to the gateway
+    data = await api.async_get_models_data([103])
+    assert data[103].getValue("W") == 800
+    assert modbus_server.connections == 1
+    assert client.transport is api._transport
+    api.disconnect()
+
+
+async def test_discovery_priority(hass, modbus_server, mocker):
+    read = mocker.spy(ModbusTcpTransport, "read")
+    api = SunSpecApiClient("127.0.0.1", modbus_server.port, 1, hass)
+
+    # Scans at startup and reconnects of the coordinator let live values go first
+    await api.async_get_models()
+    assert {call.args[4] for call in read.call_args_list} == {PRIORITY_BACKGROUND}
+
+    # A user waits on the scans of the config and options flows
+    read.reset_mock()
+    config = {"host": "127.0.0.1", "port": modbus_server.port, "unit_id": 2}
+    await api.async_get_models(config, PRIORITY_INTERACTIVE)
+    assert {call.args[4] for call in read.call_args_list} == {PRIORITY_INTERACTIVE}
+    api.disconnect()
+
+
+async def test_modbus_connect_fail(hass, socket_enabled):
+    server = await asyncio.start_server(lambda reader, writer: None, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    server.close()
+    await server.wait_closed()
+    api = SunSpecApiClient("127.0.0.1", port, 1, hass)
 
-    # To test the api submodule, we first create an instance of our API client
+    with pytest.raises(ConnectionError):
+        await api.async_get_client()
+
+
+async def test_modbus_connect_other_gateway(hass, modbus_server):
+    api = SunSpecApiClient("test", 123, 1, hass)
+    config = {"host": "127.0.0.1", "port": modbus_server.port, "unit_id": 2}
+
+    assert 160 in await api.async_get_models(config)
+    await hass.async_block_till_done()
+    # The connection to the other gateway is not kept
+    assert api._transport is None
+    assert SunSpecApiClient.TRANSPORT_CACHE == {}
+    assert modbus_server.unit_ids == {2}
+
+
+async def test_read_model_faults(hass, sunspec_client_mock):
+    api = SunSpecApiClient("test", 123, 1, hass, timeout_min=0.2, timeout_max=0.2)
+    await api.async_get_client()
+
+    sunspec_client_mock.timeout_rate = 1.0
+    with pytest.raises(ConnectionTimeoutError):
+        await api.async_get_data(1)
+
+    sunspec_client_mock.timeout_rate = 0.0
+    sunspec_client_mock.drop_rate = 1.0
+    with pytest.raises(ConnectionError):
+        await api.async_get_data(1)
+    api.disconnect()
+
+
+def test_plan_reads():
+    assert plan_reads([(10, 10), (0, 10), (25, 5)]) == [(0, 30)]
+    assert plan_reads([(0, 10), (100, 10)]) == [(0, 10), (100, 10)]
+    assert plan_reads([(0, 100), (100, 100)]) == [(0, 125), (125, 75)]
+    assert plan_reads([(0, 300)]) == [(0, 125), (125, 125), (250, 50)]
+    assert plan_reads([(0, 125), (126, 10)]) == [(0, 125), (126, 10)]
+
+
+def test_extract_range():
+    blocks = [(0, b"\x00\x01\x00\x02"), (2, b"\x00\x03"), (10, b"\x00\x04")]
+    assert extract_range(blocks, 1, 2) == b"\x00\x02\x00\x03"
+    assert extract_range(blocks, 10, 1) == b"\x00\x04"
+
+
+async def test_read_models_coalesced(hass, sunspec_client_mock):
     api = SunSpecApiClient(host="test", port=123, unit_id=1, hass=hass)
-    client = api.get_client()
-    client.scan.assert_called_once()
+    device = sunspec_client_mock.devices[1]
+    await api.async_get_client()
+    device.requests.clear()
 
-    SunSpecApiClient.CLIENT_CACHE = {}
+    data = await api.async_get_models_data([103, 160, 701])
 
+    assert device.requests == [
+        (40090, 125),
+        (40215, 125),
+        (40340, 112),
+        (40830, 50),
+    ]
+    assert data[103].getValue("W") == 800
+    assert data[160].getValue("module:0:DCA") == 90
+    assert data[701].getValue("W", 1) == 9700
 
-async def test_modbus_connect(hass, sunspec_modbus_client_mock):
-    SunSpecApiClient.CLIENT_CACHE = {}
-    """Test API calls."""
 
-    # To test the api submodule, we first create an instance of our API client
+async def test_read_models_faults(hass, sunspec_client_mock):
+    api = SunSpecApiClient("test", 123, 1, hass, timeout_min=0.2, timeout_max=0.2)
+    await api.async_get_client()
+
+    sunspec_client_mock.timeout_rate = 1.0
+    with pytest.raises(ConnectionTimeoutError):
+        await api.async_get_models_data([1])
+
+    sunspec_client_mock.timeout_rate = 0.0
+    sunspec_client_mock.drop_rate = 1.0
+    with pytest.raises(ConnectionError):
+        await api.async_get_models_data([1])
+
+    # Requests the device rejects
+    sunspec_client_mock.drop_rate = 0.0
+    sunspec_client_mock.devices.pop(1)
+    with pytest.raises(ConnectionError):
+        await api.async_get_models_data([1])
+    api.disconnect()
+
+
+def test_circuit_breaker(mocker):
+    monotonic = mocker.patch(
+        "custom_components.sunspec.api.time.monotonic", return_value=100.0
+    )
+    breaker = CircuitBreaker(max_failures=2, reset_timeout=60)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    # One trial request after the reset timeout, a failure opens it again
+    monotonic.return_value = 160.0
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    monotonic.return_value = 220.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+async def test_circuit_breaker_open(hass, sunspec_client_mock, mocker):
+    read = mocker.patch.object(
+        SunSpecApiClient, "async_read_transport", side_effect=ModbusClientTimeout
+    )
     api = SunSpecApiClient(host="test", port=123, unit_id=1, hass=hass)
-    SunSpecApiClient.CLIENT_CACHE = {}
-    client = api.get_client()
-    client.scan.assert_called_once()
 
+    for _ in range(3):
+        with pytest.raises(ConnectionTimeoutError):
+            await api.async_get_models_data([103])
+    with pytest.raises(ConnectionError):
+        await api.async_get_models_data([103])
+    assert read.call_count == 3
+
+    # Discovery is not attempted either
     SunSpecApiClient.CLIENT_CACHE = {}
+    with pytest.raises(ConnectionError):
+        api.get_client()
 
 
-async def test_modbus_connect_fail(hass, mocker):
-    mocker.patch(
-        # api_call is from slow.py but imported to main.py
-        "sunspec2.modbus.client.SunSpecModbusClientDeviceTCP.connect",
-        return_value={},
-    )
-    mocker.patch(
-        # api_call is from slow.py but imported to main.py
-        "sunspec2.modbus.client.SunSpecModbusClientDeviceTCP.is_connected",
-        return_value=False,
+async def test_circuit_breaker_gateway_offline(hass, modbus_server):
+    api = SunSpecApiClient("127.0.0.1", modbus_server.port, 1, hass)
+    await api.async_get_client()
+
+    # Exceptions a gateway returns for an offline unit count as failures
+    modbus_server.devices.pop(1)
+    for _ in range(3):
+        with pytest.raises(ConnectionError) as offline:
+            await api.async_get_models_data([103])
+        assert isinstance(offline.value.__cause__, ModbusGatewayException)
+    assert api.breaker.state == CircuitBreaker.OPEN
+    api.disconnect()
+
+
+async def test_discovery_failures_open_breaker(hass, mocker):
+    modbus_connect = mocker.patch.object(
+        SunSpecApiClient, "modbus_connect", side_effect=ConnectionError
     )
-    """Test API calls."""
+    api = SunSpecApiClient(host="test", port=123, unit_id=1, hass=hass)
 
-    # To test the api submodule, we first create an instance of our API client
+    for _ in range(4):
+        with pytest.raises(ConnectionError):
+            api.get_client()
+    assert modbus_connect.call_count == 3
+    assert api.breaker.state == CircuitBreaker.OPEN
+
+
+async def test_pacing_state(hass, hass_storage):
+    hass_storage["sunspec.devices"] = {
+        "version": 1,
+        "key": "sunspec.devices",
+        "data": {"devices": {"test:123:1": {"delay": 0.5}}},
+    }
+    api = SunSpecApiClient(host="test", port=123, unit_id=1, hass=hass)
+    api.async_save_state()
+
+    await api.async_load_state()
+    assert api.pacer.delay == 0.5
+
+    api.pacer.delay = 0.2
+    api.async_save_state()
+    store = await async_get_store(hass)
+    assert store.device("test:123:1")["delay"] == 0.2
+
+
+async def test_scan_cache(hass, sunspec_client_mock, mocker):
+    scanned = MockModbusClientDevice("./tests/test_data/inverter.json")
+    scanned.scan(full_model_read=False)
+    api = SunSpecApiClient(host="test", port=123, unit_id=1, hass=hass)
+    scan = api.dump_scan(scanned)
+    assert scan["sn"] == "sn-123456789"
+    assert scan["base_addr"] == 40000
+    assert [model["id"] for model in scan["models"]][:3] == [1, 304, 103]
+
+    api._scan = scan
+    device = MockModbusClientDevice("./tests/test_data/inverter.json")
+    assert api.restore_scan(device)
+    assert device.requests == [(40000, 70)]
+    assert [(m.model_id, m.model_addr, m.len) for m in device.model_list] == [
+        (m.model_id, m.model_addr, m.len) for m in scanned.model_list
+    ]
+    assert len(device.models[160][0].groups["module"]) == 2
+
+    mocker.patch.object(api, "modbus_connect", return_value=device)
+    data = await api.async_get_models_data([1, 160])
+    assert data[1].getValue("SN") == "sn-123456789"
+    assert data[160].getValue("module:1:DCA") == 92
+
+
+async def test_scan_cache_invalid(hass, mocker):
+    device = MockModbusClientDevice("./tests/test_data/inverter.json")
     api = SunSpecApiClient(host="test", port=123, unit_id=1, hass=hass)
+    assert not api.restore_scan(device)
 
-    with pytest.raises(Exception):
-        api.modbus_connect()
+    device.scan(full_model_read=False)
+    api._scan = api.dump_scan(device)
+    api._scan["sn"] = "other-device"
+    assert not api.restore_scan(device)
+    assert device.models == {}
 
+    api._scan["base_addr"] = 0
+    assert not api.restore_scan(device)
 
-async def test_modbus_connect_exception(hass, mocker):
-    mocker.patch(
-        # api_call is from slow.py but imported to main.py
-        "sunspec2.modbus.client.SunSpecModbusClientDeviceTCP.connect",
-        side_effect=ModbusClientError,
+    mocker.patch.object(device, "read", side_effect=ModbusClientError)
+    assert not api.restore_scan(device)
+
+
+async def test_scan_cache_persisted(hass, hass_storage, modbus_server):
+    device = modbus_server.devices[1]
+    api = SunSpecApiClient("127.0.0.1", modbus_server.port, 1, hass)
+    await api.async_load_state()
+    await api.async_get_client()
+    api.async_save_state()
+    api.disconnect()
+
+    # The next session only validates the cached scan
+    SunSpecApiClient.CLIENT_CACHE = {}
+    device.requests.clear()
+    api = SunSpecApiClient("127.0.0.1", modbus_server.port, 1, hass)
+    await api.async_load_state()
+    assert api._scan["sn"] == "sn-123456789"
+    client = await api.async_get_client()
+    assert device.requests == [(40000, 70)]
+    assert 160 in client.models
+
+    # A rescan asked for in the options flow replaces the persisted scan
+    config = {"host": "127.0.0.1", "port": modbus_server.port, "unit_id": 1}
+    await api.async_get_models(config)
+    store = await async_get_store(hass)
+    assert store.device(f"127.0.0.1:{modbus_server.port}:1")["scan"] is None
+    # One connection per session, shared by the rescan
+    assert modbus_server.connections == 2
+    api.disconnect()
+
+
+async def test_read_models_transport(hass, modbus_server, mocker):
+    api = SunSpecApiClient(
+        host="127.0.0.1", port=modbus_server.port, unit_id=1, hass=hass
     )
-    mocker.patch(
-        # api_call is from slow.py but imported to main.py
-        "sunspec2.modbus.client.SunSpecModbusClientDeviceTCP.is_connected",
-        return_value=False,
+    await api.async_get_client()
+    api.stats.start_cycle()
+
+    data = await api.async_get_models_data([103, 160])
+    assert data[103].getValue("W") == 800
+    assert data[160].getValue("module:1:DCA") == 92
+    device_info = await api.async_get_device_info()
+    assert device_info.getValue("SN") == "sn-123456789"
+    # Polling goes on over the connection discovery opened
+    assert modbus_server.connections == 1
+    assert api.stats.cycle.reconnects == 0
+    assert api.stats.cycle.requests == 3
+    assert set(api.stats.cycle.models) == {1, 103, 160}
+
+    # Kept alive connection dropped by the device
+    modbus_server.drop_connections()
+    data = await api.async_get_models_data([103])
+    assert data[103].getValue("W") == 800
+    assert modbus_server.connections == 2
+    assert api.stats.cycle.retries == 1
+    assert api.stats.cycle.reconnects == 1
+
+    # Idle kept alive connection
+    api._transport.last_used = time.monotonic() - KEEP_ALIVE_IDLE_TIMEOUT
+    await api.async_get_models_data([103])
+    assert modbus_server.connections == 3
+
+    transport = api._transport
+    api.disconnect()
+    assert not transport.connected
+    assert SunSpecApiClient.TRANSPORT_CACHE == {}
+
+
+async def test_read_models_transport_rejected(hass, modbus_server, mocker):
+    read = modbus_server.devices[1].read
+
+    def reject_long_reads(addr, count):
+        if count == 125:
+            return b""
+        return read(addr, count)
+
+    mocker.patch.object(modbus_server.devices[1], "read", reject_long_reads)
+    api = SunSpecApiClient(
+        host="127.0.0.1",
+        port=modbus_server.port,
+        unit_id=1,
+        hass=hass,
+        keep_alive=False,
     )
-    mocker.patch(
-        "custom_components.sunspec.SunSpecApiClient.check_port", return_value=True
+
+    data = await api.async_get_models_data([103, 701])
+    assert data[701].getValue("W", 1) == 9700
+    assert not api._coalesce
+
+    # Coalesced reads are tried again later
+    mocker.patch.object(modbus_server.devices[1], "read", read)
+    api._coalesce_retry = time.monotonic()
+    await api.async_get_models_data([103, 701])
+    assert api._coalesce
+
+    api.close()
+    assert not api._transport.connected
+    # Reads model by model are rejected too, coalescing was not to blame
+    mocker.patch.object(modbus_server.devices[1], "read", return_value=b"")
+    with pytest.raises(ModbusClientException):
+        await api.async_read_transport(await api.async_get_client(), [701])
+    assert api._coalesce
+
+
+async def test_read_models_gateway_offline(hass, modbus_server):
+    api = SunSpecApiClient("127.0.0.1", modbus_server.port, 1, hass)
+    await api.async_get_client()
+
+    # The gateway answers for a unit that is offline
+    device = modbus_server.devices.pop(1)
+    with pytest.raises(ConnectionError) as offline:
+        await api.async_get_models_data([103, 701])
+    assert isinstance(offline.value.__cause__, ModbusGatewayException)
+    assert api._coalesce
+
+    modbus_server.devices[1] = device
+    device.requests.clear()
+    data = await api.async_get_models_data([103, 701])
+    assert data[103].getValue("W") == 800
+    assert api._coalesce
+    api.disconnect()
+
+
+async def test_read_models_shared_gateway(hass, modbus_server, mocker):
+    apis = [
+        SunSpecApiClient(
+            host="127.0.0.1", port=modbus_server.port, unit_id=unit_id, hass=hass
+        )
+        for unit_id in (1, 2)
+    ]
+
+    results = await asyncio.gather(
+        *[api.async_get_models_data([103, 160]) for api in apis]
     )
-    """Test API calls."""
+    assert [data[103].getValue("W") for data in results] == [800, 800]
+    assert apis[0]._transport is apis[1]._transport
+    assert modbus_server.unit_ids == {1, 2}
+    # One connection shared for discovery and polling
+    assert modbus_server.connections == 1
+
+    transport = apis[0]._transport
+    apis[0].disconnect()
+    assert transport.connected
+    apis[1].disconnect()
+    assert not transport.connected
+
+
+async def test_shared_gateway_keep_alive(hass, modbus_server):
+    apis = [
+        SunSpecApiClient(
+            host="127.0.0.1",
+            port=modbus_server.port,
+            unit_id=unit_id,
+            hass=hass,
+            keep_alive=keep_alive,
+        )
+        for unit_id, keep_alive in ((1, False), (2, True))
+    ]
+    for api in apis:
+        await api.async_get_models_data([103])
+    transport = apis[0]._transport
 
-    # To test the api submodule, we first create an instance of our API client
+    # The other unit keeps the shared connection alive
+    apis[0].close()
+    assert transport.connected
+    assert modbus_server.connections == 1
+
+    apis[1].disconnect()
+    apis[0].close()
+    assert not transport.connected
+    apis[0].disconnect()
+
+
+async def test_point_accessor(hass, sunspec_client_mock):
     api = SunSpecApiClient(host="test", port=123, unit_id=1, hass=hass)
+    data = await api.async_get_models_data([160, 701])
 
-    with pytest.raises(ConnectionError):
-        api.modbus_connect()
+    dca = PointAccessor("module:1:DCA")
+    assert dca.value(data[160]) == data[160].getValue("module:1:DCA")
+    assert dca.point(data[160]) is dca.point(data[160])
+    w = PointAccessor("W", 1)
+    assert w.value(data[701]) == data[701].getValue("W", 1)
 
 
-async def test_read_model_timeout(hass, mocker):
-    mocker.patch(
-        "custom_components.sunspec.api.SunSpecApiClient.read_model",
-        side_effect=SunSpecModbusClientTimeout,
-    )
+async def test_device_record_read(hass, sunspec_client_mock):
     api = SunSpecApiClient(host="test", port=123, unit_id=1, hass=hass)
+    client = await api.async_get_client()
+    # The scan did not read the points of the common model
+    assert client.models[1][0].points["Mn"].value is None
+    record = await api.async_get_device_record()
+    assert (record.manufacturer, record.sw_version) == ("SunSpecTest", "1.2.3")
 
-    with pytest.raises(ConnectionTimeoutError):
-        await api.async_get_data(1)
 
+async def test_read_models_decoded(hass, sunspec_client_mock):
+    api = SunSpecApiClient(host="test", port=123, unit_id=1, hass=hass)
+    data = await api.async_get_models_data([160, 701])
+    assert data[160]._tables is not None
+
+    dca = PointAccessor("module:1:DCA")
+    assert dca.value(data[160]) == 92
+    assert PointAccessor("W", 1).value(data[701]) == 9700
+    assert "module:1:DCA" in data[160].getKeys()
+    # Decoded values are not copied to the sunspec2 points
+    assert SunSpecModelWrapper(data[160]._models).getKeys() == []
 
-async def test_read_model_error(hass, mocker):
-    mocker.patch(
-        "custom_components.sunspec.api.SunSpecApiClient.read_model",
-        side_effect=SunSpecModbusClientException,
-    )
+    # Incomplete register data is set on the points instead
+    model = (await api.async_get_client()).models[160][0]
+    api.decode(model, b"\x00\xa0\x00\x10")
+    assert api.model_wrapper([model])._tables is None
+
+
+async def test_read_model_instances(hass, sunspec_client_mock):
     api = SunSpecApiClient(host="test", port=123, unit_id=1, hass=hass)
+    first, second = (await api.async_get_client()).models[701]
+    data = await api.async_get_models_data([701], {701: {1: None}})
+
+    assert data[701]._tables[0] is None
+    assert PointAccessor("W", 1).value(data[701]) == 9700
+    assert data[701].getValue("W", 1) == 9700
+    assert api.stats.cycle.models == {701: (pytest.approx(0, abs=1), second.len + 2)}
+    assert data[701].getValue("W") == first.points["W"].cvalue
+
+
+async def start_simulator(units=(1,), **kwargs):
+    device = SimulatedDevice.from_file("./tests/test_data/inverter.json")
+    simulator = SunSpecSimulator({unit_id: device for unit_id in units}, **kwargs)
+    await simulator.start()
+    return simulator
+
+
+async def test_simulated_site(hass, socket_enabled):
+    units = range(1, 6)
+    simulator = await start_simulator(
+        units, latency=0.005, jitter=0.005, serial=True, seed=1
+    )
+    apis = [
+        SunSpecApiClient("127.0.0.1", simulator.port, unit_id, hass)
+        for unit_id in units
+    ]
+    for api in apis:
+        assert 160 in await api.async_get_models()
+
+    results = await asyncio.gather(
+        *[api.async_get_models_data([103, 160]) for api in apis]
+    )
+    assert [data[103].getValue("W") for data in results] == [800] * len(units)
+    assert simulator.unit_ids == set(units)
+    assert apis[0].pacer.response_time > 0
+
+    unknown = SunSpecApiClient("127.0.0.1", simulator.port, 9, hass)
+    with pytest.raises(SunSpecModbusClientError):
+        await unknown.async_get_models()
 
+    for api in apis:
+        api.disconnect()
+    await simulator.stop()
+
+
+async def test_cycle_budget(hass, modbus_server, mocker):
+    api = SunSpecApiClient(
+        host="127.0.0.1", port=modbus_server.port, unit_id=1, hass=hass
+    )
+    api._coalesce = False
+    first = await api.async_get_models_data([103])
+
+    # Out of time after the first request, only the models it covered are read
+    api.start_cycle(0.01)
+    modbus_server.latency = 0.02
+    data = await api.async_get_models_data([1, 103])
+    assert list(data) == [1]
+    assert api.stats.cycle.overruns == 1
+    api.end_cycle(True, 10)
+    assert data[1].getValue("SN") == "sn-123456789"
+    assert first[103].getValue("W") == 800
+
+    # No limit outside poll cycles
+    data = await api.async_get_models_data([1, 103])
+    assert list(data) == [1, 103]
+    api.disconnect()
+
+
+async def test_sparse_reads(hass, socket_enabled):
+    simulator = await start_simulator()
+    device = simulator.devices[1]
+    api = SunSpecApiClient("127.0.0.1", simulator.port, 1, hass, read_gap=4)
+    await api.async_get_models()
+    model = (await api.async_get_client()).models[103][0]
+    first = await api.async_get_models_data([103], {103: {0: {"W"}}})
+    # Models are read whole first
+    assert device.requests[-1] == (model.model_addr, model.len + 2)
+
+    offset = (model.points["W"].offset + model.model_addr - BASE_ADDR) * 2
+    device.registers = (
+        device.registers[:offset] + b"\x03\x84" + device.registers[offset + 2 :]
+    )
+    device.requests.clear()
+    api.stats.start_cycle()
+    data = await api.async_get_models_data([103], {103: {0: {"W"}}})
+    # Only W and its scale factor, which are close enough to be read together
+    w_sf = model.points["W_SF"]
+    assert device.requests == [
+        (
+            model.model_addr + model.points["W"].offset,
+            w_sf.offset - model.points["W"].offset + 1,
+        )
+    ]
+    assert data[103].getValue("W") == 900
+    assert data[103].getValue("A") == first[103].getValue("A")
+    assert api.stats.cycle.registers == device.requests[0][1]
+
+    # Unknown keys and disabled sparse reads read the whole model
+    device.requests.clear()
+    await api.async_get_models_data([103], {103: {0: {"Nope"}}})
+    api._sparse = False
+    await api.async_get_models_data([103], {103: {0: {"W"}}})
+    assert device.requests == [(model.model_addr, model.len + 2)] * 2
+    api.disconnect()
+    await simulator.stop()
+
+
+async def test_trim_empty_groups(hass, socket_enabled):
+    simulator = await start_simulator()
+    device = simulator.devices[1]
+    api = SunSpecApiClient("127.0.0.1", simulator.port, 1, hass)
+    await api.async_get_models()
+    model = (await api.async_get_client()).models[160][0]
+    # The second module reads all zero
+    module = model.groups["module"][1]
+    start = model.model_addr + module.points["ID"].offset
+    end = model.model_addr + model.len + 2
+    offset = (start - BASE_ADDR) * 2
+    device.registers = (
+        device.registers[:offset]
+        + bytes((end - start) * 2)
+        + device.registers[(end - BASE_ADDR) * 2 :]
+    )
+    data = await api.async_get_models_data([160])
+    assert "module:1:DCA" in data[160].getKeys()
+
+    # The second module is not populated
+    device.registers = (
+        device.registers[:offset]
+        + unimplemented_registers(module)
+        + device.registers[(end - BASE_ADDR) * 2 :]
+    )
+    api._full_reads[model] -= GROUP_RECHECK_INTERVAL
+    data = await api.async_get_models_data([160])
+    keys = data[160].getKeys()
+    assert "module:0:DCA" in keys
+    assert not [key for key in keys if key.startswith("module:1:")]
+
+    device.requests.clear()
+    await api.async_get_models_data([160])
+    assert device.requests == [(model.model_addr, start - model.model_addr)]
+
+    # Empty groups are rechecked with a full read now and then
+    api._full_reads[model] -= GROUP_RECHECK_INTERVAL
+    device.requests.clear()
+    await api.async_get_models_data([160])
+    assert device.requests == [(model.model_addr, model.len + 2)]
+    api.disconnect()
+    await simulator.stop()
+
+
+async def test_simulated_faults(hass, socket_enabled, mocker):
+    simulator = await start_simulator(session_delay=0.05)
+    api = SunSpecApiClient(
+        "127.0.0.1", simulator.port, 1, hass, timeout_min=0.5, timeout_max=0.5
+    )
+    await api.async_get_models()
+    data = await api.async_get_models_data([103])
+    assert data[103].getValue("W") == 800
+
+    simulator.drop_rate = 1.0
     with pytest.raises(ConnectionError):
-        await api.async_get_data(1)
+        await api.async_get_models_data([103])
+
+    simulator.drop_rate = 0.0
+    simulator.timeout_rate = 1.0
+    with pytest.raises(ConnectionTimeoutError):
+        await api.async_get_models_data([103])
+    assert api.pacer.delay > 0
+    assert api.stats.cycle.timeouts == 1
+
+    # A gateway slower to open its session than the request timeout
+    simulator.timeout_rate = 0.0
+    simulator.session_delay = 0.8
+    simulator.drop_connections()
+    with pytest.raises(ConnectionTimeoutError):
+        await api.async_get_models_data([103])
+
+    api.disconnect()
+    await simulator.stop()
@@ -6,9 +6,13 @@ from homeassistant import config_entries
 from homeassistant.data_entry_flow import FlowResultType
 import pytest
 from pytest_homeassistant_custom_component.common import MockConfigEntry
+import voluptuous as vol
 
 from custom_components.sunspec.const import CONF_ENABLED_MODELS
+from custom_components.sunspec.const import CONF_PARALLEL_POLLS
 from custom_components.sunspec.const import CONF_SCAN_INTERVAL
+from custom_components.sunspec.const import CONF_TIMEOUT_MAX
+from custom_components.sunspec.const import CONF_TIMEOUT_MIN
 from custom_components.sunspec.const import DOMAIN
 
 from . import MockSunSpecDataUpdateCoordinator
@@ -188,6 +192,43 @@ async def test_options_flow(hass, sunspec_client_mock):
     # assert entry.options == {BINARY_SENSOR: True, SENSOR: False, SWITCH: True}
 
 
+async def test_options_flow_timeout_range(hass, sunspec_client_mock):
+    """Test the request timeout bounds are checked."""
+    entry = MockConfigEntry(domain=DOMAIN, data=MOCK_CONFIG, entry_id="test")
+    entry.add_to_hass(hass)
+    hass.data[DOMAIN] = {entry.entry_id: MockSunSpecDataUpdateCoordinator(hass, [1])}
+
+    result = await hass.config_entries.options.async_init(entry.entry_id)
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"], user_input=MOCK_CONFIG_STEP_1
+    )
+    assert result["step_id"] == "model_options"
+
+    with pytest.raises(vol.Invalid, match=CONF_PARALLEL_POLLS):
+        await hass.config_entries.options.async_configure(
+            result["flow_id"],
+            user_input={CONF_ENABLED_MODELS: [], CONF_PARALLEL_POLLS: 0},
+        )
+
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"],
+        user_input={CONF_ENABLED_MODELS: [], CONF_TIMEOUT_MIN: 10, CONF_TIMEOUT_MAX: 5},
+    )
+    assert result["type"] == FlowResultType.FORM
+    assert result["step_id"] == "model_options"
+    assert result["errors"] == {"base": "timeout_range"}
+
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"],
+        user_input={CONF_ENABLED_MODELS: [], CONF_TIMEOUT_MIN: 5, CONF_TIMEOUT_MAX: 10},
+    )
+    assert result["type"] == FlowResultType.CREATE_ENTRY
+    assert (result["data"][CONF_TIMEOUT_MIN], result["data"][CONF_TIMEOUT_MAX]) == (
+        5,
+        10,
+    )
+
+
 # Test faild connection in options flow
 async def test_options_flow_connect_error(hass, sunspec_client_mock_connect_error):
     """Test an options flow."""
@@ -0,0 +1,108 @@
+"""Tests for SunSpec bulk register decoding."""
+
+import struct
+
+from custom_components.sunspec.api import SunSpecModelWrapper
+from custom_components.sunspec.decode import ModelDecoder
+
+from . import unimplemented_registers
+from .conftest import MockModbusClientDevice
+
+
+def model_registers(device, model):
+    offset = (model.model_addr - device.image_addr) * 2
+    return device.registers[offset : offset + (model.len + 2) * 2]
+
+
+def test_decode_matches_points():
+    device = MockModbusClientDevice("./tests/test_data/inverter.json")
+    device.scan(full_model_read=False)
+
+    for model in device.model_list:
+        data = model_registers(device, model)
+        decoder = ModelDecoder(model)
+        values = decoder.decode(data)
+        model.set_mb(data, dirty=False)
+        wrapper = SunSpecModelWrapper([model])
+        for key, position in decoder.positions.items():
+            expected = wrapper.getPoint(key).cvalue
+            assert values[position] == expected, (model.model_id, key)
+
+
+def test_decode_unimplemented():
+    device = MockModbusClientDevice("./tests/test_data/inverter.json")
+    device.scan(full_model_read=False)
+    model = device.models[701][0]
+    decoder = ModelDecoder(model)
+    data = bytearray(model_registers(device, model))
+
+    offset = model.points["W"].offset * 2
+    data[offset : offset + 2] = struct.pack(">h", -32768)
+    offset = model.points["W_SF"].offset * 2
+    data[offset : offset + 2] = struct.pack(">h", -32768)
+    offset = model.points["TotWhInj"].offset * 2
+    data[offset : offset + 8] = struct.pack(">Q", 0xFFFFFFFFFFFFFFFF)
+    values = decoder.decode(bytes(data))
+    assert values[decoder.positions["W"]] is None
+    assert values[decoder.positions["W_SF"]] is None
+    assert values[decoder.positions["TotWhInj"]] is None
+    # Without a scale factor values are not scaled
+    offset = model.points["WL1"].offset * 2
+    raw = struct.unpack(">h", data[offset : offset + 2])[0]
+    assert values[decoder.positions["WL1"]] == raw
+
+    assert decoder.decode(bytes(data[:10])) is None
+
+
+def test_decode_strings():
+    device = MockModbusClientDevice("./tests/test_data/inverter.json")
+    device.scan(full_model_read=False)
+    model = device.models[1][0]
+    decoder = ModelDecoder(model)
+    data = bytearray(model_registers(device, model))
+
+    offset = model.points["Mn"].offset * 2
+    data[offset : offset + 2] = b"\xff\xfe"
+    values = decoder.decode(bytes(data))
+    assert values[decoder.positions["Mn"]] is None
+    assert values[decoder.positions["SN"]] == "sn-123456789"
+
+
+def test_decode_spans():
+    device = MockModbusClientDevice("./tests/test_data/inverter.json")
+    device.scan(full_model_read=False)
+    model = device.models[160][0]
+    decoder = ModelDecoder(model)
+
+    dca = model.groups["module"][1].points["DCA"]
+    dca_sf = model.points["DCA_SF"]
+    assert decoder.spans(["module:1:DCA"]) == sorted(
+        [(dca.offset, 1), (dca_sf.offset, 1)]
+    )
+    assert decoder.spans(["module:1:DCA", "unknown"]) is None
+
+
+def test_decode_empty_groups():
+    device = MockModbusClientDevice("./tests/test_data/inverter.json")
+    device.scan(full_model_read=False)
+    model = device.models[160][0]
+    decoder = ModelDecoder(model)
+    data = bytearray(model_registers(device, model))
+    assert decoder.empty_groups(decoder.decode(bytes(data))) == set()
+    assert decoder.trimmed_spans(set()) == [(0, model.len + 2)]
+
+    # A populated module may read all zero
+    first = model.groups["module"][0]
+    second = model.groups["module"][1]
+    start = second.points["ID"].offset
+    data[start * 2 :] = bytes(len(data) - start * 2)
+    assert decoder.empty_groups(decoder.decode(bytes(data))) == set()
+
+    # An unpopulated module only holds unimplemented values
+    data[start * 2 :] = unimplemented_registers(second)
+    assert decoder.empty_groups(decoder.decode(bytes(data))) == {"module:1:"}
+    assert decoder.trimmed_spans({"module:1:"}) == [(0, start)]
+    assert decoder.trimmed_spans({"module:0:"}) == [
+        (0, first.points["ID"].offset),
+        (start, model.len + 2 - start),
+    ]
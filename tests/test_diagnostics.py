@@ -0,0 +1,18 @@
+"""Test SunSpec diagnostics."""
+
+from homeassistant.components.diagnostics import REDACTED
+
+from custom_components.sunspec.diagnostics import async_get_config_entry_diagnostics
+
+from . import setup_mock_sunspec_config_entry
+
+
+async def test_diagnostics(hass, sunspec_client_mock):
+    config_entry = await setup_mock_sunspec_config_entry(hass)
+
+    diagnostics = await async_get_config_entry_diagnostics(hass, config_entry)
+    assert diagnostics["entry"]["data"]["host"] == REDACTED
+    assert diagnostics["polling"]["update_interval_s"] == 10
+    assert diagnostics["stats"]["cycles"] == 1
+    assert diagnostics["stats"]["last_cycle"]["success"]
+    assert diagnostics["scheduler"] == {"parallel_polls": 8, "active": 0, "waiting": 0}
@@ -1,14 +1,29 @@
 """Test SunSpec setup process."""
 
+import itertools
+import time
+
 from homeassistant.config_entries import ConfigEntryState
 from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers import entity_registry as er
 import pytest
 from pytest_homeassistant_custom_component.common import MockConfigEntry
 
 from custom_components.sunspec import SunSpecDataUpdateCoordinator
 from custom_components.sunspec import async_setup_entry
+from custom_components.sunspec import get_model_tier
+from custom_components.sunspec.api import SunSpecApiClient
+from custom_components.sunspec.const import BACKOFF_MAX_INTERVAL
+from custom_components.sunspec.const import CONF_ENABLED_MODELS
+from custom_components.sunspec.const import CONF_STATIC_SCAN_INTERVAL
 from custom_components.sunspec.const import DOMAIN
+from custom_components.sunspec.const import STALE_DATA_MAX_AGE
+from custom_components.sunspec.const import TIER_STATIC
+from custom_components.sunspec.transport import PRIORITY_BACKGROUND
+from custom_components.sunspec.transport import PRIORITY_TELEMETRY
 
+from . import set_point_value
 from . import setup_mock_sunspec_config_entry
 from .const import MOCK_CONFIG
 
@@ -89,8 +104,249 @@ async def test_fetch_data_connect_error(hass, connect_error_on_get_data):
         assert await async_setup_entry(hass, config_entry)
 
 
-async def test_client_reconnect(hass, sunspec_client_mock_not_connected) -> None:
-    await setup_mock_sunspec_config_entry(hass, MOCK_CONFIG)
+async def test_polling_tiers(hass, sunspec_client_mock, mocker):
+    """Test that each cycle only reads the models that are due."""
+    assert get_model_tier(103) == "fast"
+    assert get_model_tier(304) == "normal"
+    assert get_model_tier(702) == "static"
+
+    config_entry = MockConfigEntry(
+        domain=DOMAIN,
+        data=MOCK_CONFIG,
+        options={CONF_ENABLED_MODELS: [103, 304, 702], CONF_STATIC_SCAN_INTERVAL: 600},
+        entry_id="test",
+    )
+    api = SunSpecApiClient("test_host", 123, 1, hass)
+    coordinator = SunSpecDataUpdateCoordinator(hass, client=api, entry=config_entry)
+    assert coordinator.update_interval.total_seconds() == 10
+    get_models_data = mocker.spy(api, "async_get_models_data")
+    monotonic = mocker.patch("custom_components.sunspec.time.monotonic")
+
+    def cycle(now):
+        monotonic.return_value = now
+        get_models_data.reset_mock()
+        return coordinator.async_refresh()
+
+    # The common model is read on the static tier even when it is not enabled
+    await cycle(1000)
+    get_models_data.assert_called_once_with(
+        [1, 103, 304, 702], None, priority=PRIORITY_TELEMETRY
+    )
+    assert coordinator.device.serial_number == "sn-123456789"
+    await cycle(1010)
+    get_models_data.assert_called_once_with([103], None, priority=PRIORITY_TELEMETRY)
+    assert set(coordinator.data) == {103, 304, 702}
+    await cycle(1300)
+    get_models_data.assert_called_once_with(
+        [103, 304], None, priority=PRIORITY_TELEMETRY
+    )
+    await cycle(1600)
+    get_models_data.assert_called_once_with(
+        [1, 103, 304, 702], None, priority=PRIORITY_TELEMETRY
+    )
+
+    # Nothing due when only slow models are enabled
+    config_entry = MockConfigEntry(
+        domain=DOMAIN, data=MOCK_CONFIG, options={CONF_ENABLED_MODELS: [702]}
+    )
+    coordinator = SunSpecDataUpdateCoordinator(hass, client=api, entry=config_entry)
+    assert coordinator.update_interval.total_seconds() == 3600
+    coordinator.last_read.update({1: 1600, 702: 1600})
+    await cycle(1610)
+    get_models_data.assert_not_called()
+    # Reads of static models alone give way to live values
+    await cycle(5200)
+    get_models_data.assert_called_once_with(
+        [1, 702], None, priority=PRIORITY_BACKGROUND
+    )
+
+
+async def test_offline_backoff(hass, sunspec_client_mock, mocker):
+    """Test unreachable and sleeping devices are polled less often."""
+    config_entry = MockConfigEntry(
+        domain=DOMAIN,
+        data=MOCK_CONFIG,
+        options={CONF_ENABLED_MODELS: [103]},
+        entry_id="test",
+    )
+    api = SunSpecApiClient("test_host", 123, 1, hass)
+    coordinator = SunSpecDataUpdateCoordinator(hass, client=api, entry=config_entry)
+    await coordinator.async_refresh()
+    data = coordinator.data
+    assert coordinator.update_interval.total_seconds() == 10
+    # Every cycle is far enough from the previous one for all models to be due
+    mocker.patch(
+        "custom_components.sunspec.time.monotonic",
+        side_effect=itertools.count(time.monotonic() + 1000, 1000),
+    )
+
+    read = mocker.patch.object(
+        api, "async_get_models_data", side_effect=ConnectionError
+    )
+    await coordinator.async_refresh()
+    assert coordinator.last_update_success
+    assert coordinator.stale
+    assert coordinator.data == data
+    assert coordinator.update_interval.total_seconds() == 20
+    await coordinator.async_refresh()
+    assert coordinator.update_interval.total_seconds() == 40
+    for _ in range(5):
+        await coordinator.async_refresh()
+    assert coordinator.update_interval.total_seconds() == BACKOFF_MAX_INTERVAL
+    assert coordinator.last_update_success
+
+    # Unreachable for too long at the slowest interval, the values are dropped
+    ceiling_since = coordinator.ceiling_since
+    for _ in range(10):
+        await coordinator.async_refresh()
+        if not coordinator.last_update_success:
+            break
+    assert not coordinator.last_update_success
+    assert time.monotonic() - ceiling_since >= STALE_DATA_MAX_AGE
+    assert coordinator.update_interval.total_seconds() == BACKOFF_MAX_INTERVAL
+
+    read.side_effect = None
+    read.return_value = data
+    await coordinator.async_refresh()
+    assert not coordinator.stale
+    assert coordinator.update_interval.total_seconds() == 10
+
+    # A sleeping inverter answers, but there is no need to ask often
+    set_point_value(data[103], "St", 2)
+    await coordinator.async_refresh()
+    assert not coordinator.stale
+    assert coordinator.update_interval.total_seconds() == 20
+    set_point_value(data[103], "St", 4)
+    await coordinator.async_refresh()
+    assert coordinator.update_interval.total_seconds() == 10
+
+
+async def test_sleeping_inverter_backoff(hass, sunspec_client_mock, mocker):
+    """Test only the inverter models of a sleeping inverter are read less often."""
+    config_entry = MockConfigEntry(
+        domain=DOMAIN,
+        data=MOCK_CONFIG,
+        options={CONF_ENABLED_MODELS: [103, 160]},
+        entry_id="test",
+    )
+    api = SunSpecApiClient("test_host", 123, 1, hass)
+    coordinator = SunSpecDataUpdateCoordinator(hass, client=api, entry=config_entry)
+    await coordinator.async_refresh()
+    client = await api.async_get_client()
+    inverter = client.models[103][0]
+    state = inverter.model_addr + inverter.points["St"].offset
+    sunspec_client_mock.devices[1].write(state, (2).to_bytes(2, "big"))
+    get_models_data = mocker.spy(api, "async_get_models_data")
+
+    async def refresh():
+        # Cycles are one scan interval apart
+        for model_id in coordinator.last_read:
+            coordinator.last_read[model_id] -= 10
+        await coordinator.async_refresh()
+        assert coordinator.last_update_success
+
+    await refresh()
+    assert coordinator.asleep == 1
+    assert coordinator.update_interval.total_seconds() == 10
+
+    # The inverter is read every other cycle, the MPPT model every cycle
+    for _ in range(4):
+        await refresh()
+    read = [call.args[0] for call in get_models_data.call_args_list]
+    assert read == [[103, 160], [160], [103, 160], [160], [160]]
+    assert coordinator.asleep == 2
+
+    # A cycle without the inverter keeps the sleep state it last read
+    sunspec_client_mock.devices[1].write(state, (4).to_bytes(2, "big"))
+    await refresh()
+    assert coordinator.asleep == 2
+    await refresh()
+    assert get_models_data.call_args.args[0] == [103, 160]
+    assert coordinator.asleep == 0
+    assert coordinator.update_interval.total_seconds() == 10
+
+
+async def test_read_enabled_entities_only(hass, sunspec_client_mock, mocker):
+    """Test models without enabled entities are not read."""
+    config_entry = await setup_mock_sunspec_config_entry(hass)
+    coordinator = hass.data[DOMAIN][config_entry.entry_id]
+    assert coordinator.follow_entities
+    assert {103, 160} <= set(coordinator.enabled_instances())
+
+    registry = er.async_get(hass)
+    for entry in er.async_entries_for_config_entry(registry, config_entry.entry_id):
+        if entry.unique_id.endswith("-160-0"):
+            registry.async_update_entity(
+                entry.entity_id, disabled_by=er.RegistryEntryDisabler.USER
+            )
+    await hass.async_block_till_done()
+    assert 160 not in coordinator.enabled_instances()
+
+    get_models_data = mocker.spy(coordinator.api, "async_get_models_data")
+    coordinator.last_read.clear()
+    await coordinator.async_refresh()
+    model_ids, instances = get_models_data.call_args.args
+    assert 103 in model_ids
+    assert 160 not in model_ids
+    assert list(instances[103]) == [0]
+    # The operating state is read for sleep detection even without an entity
+    assert {"W", "St"} <= instances[103][0]
+
+
+async def test_device_record(hass, sunspec_client_mock):
+    """Test entities share the device info, which follows firmware updates."""
+    config_entry = await setup_mock_sunspec_config_entry(hass)
+    coordinator = hass.data[DOMAIN][config_entry.entry_id]
+    sensors = hass.data["entity_components"]["sensor"].entities
+    infos = {id(sensor.device_info) for sensor in sensors}
+    assert len(infos) == len({sensor.model_info["name"] for sensor in sensors})
+
+    coordinator.update_device(coordinator.device)
+    assert {id(sensor.device_info) for sensor in sensors} == infos
+
+    coordinator.update_device(coordinator.device._replace(sw_version="2.0.0"))
+    assert {id(sensor.device_info) for sensor in sensors} != infos
+    registry = dr.async_get(hass)
+    devices = dr.async_entries_for_config_entry(registry, config_entry.entry_id)
+    assert devices
+    assert {device.sw_version for device in devices} == {"2.0.0"}
+
+
+async def test_device_record_polled(hass, sunspec_client_mock):
+    """Test polling brings firmware updates to the device registry."""
+    config_entry = await setup_mock_sunspec_config_entry(hass)
+    coordinator = hass.data[DOMAIN][config_entry.entry_id]
+    assert coordinator.follow_entities
+    assert 1 not in coordinator.option_model_filter
+
+    client = await coordinator.api.async_get_client()
+    common = client.models[1][0]
+    version = common.points["Vr"]
+    sunspec_client_mock.devices[1].write(
+        common.model_addr + version.offset, b"2.0.0".ljust(version.len * 2, b"\0")
+    )
+    # The common model is on the static tier
+    coordinator.last_read[1] -= coordinator.tier_intervals[TIER_STATIC]
+    await coordinator.async_refresh()
+
+    assert coordinator.device.sw_version == "2.0.0"
+    registry = dr.async_get(hass)
+    devices = dr.async_entries_for_config_entry(registry, config_entry.entry_id)
+    assert devices
+    assert {device.sw_version for device in devices} == {"2.0.0"}
+
+
+async def test_client_reconnect(hass, sunspec_client_mock) -> None:
+    config_entry = await setup_mock_sunspec_config_entry(hass, MOCK_CONFIG)
+    coordinator = hass.data[DOMAIN][config_entry.entry_id]
+    connections = sunspec_client_mock.connections
+
+    # The device closed the kept alive connection between two polls
+    sunspec_client_mock.drop_connections()
+    coordinator.last_read.clear()
+    await coordinator.async_refresh()
+    assert coordinator.last_update_success
+    assert sunspec_client_mock.connections == connections + 1
 
 
 async def test_migrate_entry_from_v1_to_v2_with_slave_id(hass):
@@ -0,0 +1,90 @@
+"""Test SunSpec poll scheduling."""
+
+import asyncio
+import threading
+
+import pytest
+
+from custom_components.sunspec.const import DOMAIN_DATA
+from custom_components.sunspec.scheduler import PollScheduler
+from custom_components.sunspec.scheduler import get_scheduler
+from custom_components.sunspec.scheduler import release_scheduler
+
+
+async def test_parallel_limit():
+    scheduler = PollScheduler(workers=1)
+    scheduler.configure("a", 4)
+    scheduler.configure("b", 2)
+    assert scheduler.limit == 2
+
+    order = []
+
+    async def poll(key):
+        async with scheduler.slot(key):
+            order.append(key)
+            assert scheduler.active <= 2
+            await asyncio.sleep(0)
+
+    await asyncio.gather(*[poll(key) for key in "aaab"])
+    assert scheduler.active == 0
+    assert order == ["a", "a", "a", "b"]
+
+    scheduler.remove("b")
+    assert scheduler.limit == 4
+    scheduler.shutdown()
+
+
+async def test_fair_queuing():
+    scheduler = PollScheduler(workers=1)
+    scheduler.configure("a", 1)
+    await scheduler.acquire("a")
+    order = []
+
+    async def poll(key):
+        async with scheduler.slot(key):
+            order.append(key)
+
+    tasks = [asyncio.create_task(poll(key)) for key in "aaabc"]
+    await asyncio.sleep(0)
+    assert scheduler.waiting == 5
+    scheduler.release()
+    await asyncio.gather(*tasks)
+    assert order == ["a", "b", "c", "a", "a"]
+    scheduler.shutdown()
+
+
+async def test_cancelled_wait():
+    scheduler = PollScheduler(workers=1)
+    scheduler.configure("a", 1)
+    await scheduler.acquire("a")
+
+    waiting = asyncio.create_task(scheduler.acquire("b"))
+    await asyncio.sleep(0)
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+    scheduler.release()
+    assert scheduler.active == 0
+
+    # A turn granted just before the cancellation is given back
+    await scheduler.acquire("a")
+    granted = asyncio.create_task(scheduler.acquire("b"))
+    await asyncio.sleep(0)
+    scheduler.release()
+    granted.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await granted
+    assert scheduler.active == 0
+    scheduler.shutdown()
+
+
+async def test_run_on_pool(hass):
+    scheduler = get_scheduler(hass)
+    assert get_scheduler(hass) is scheduler
+    scheduler.configure("a", 2)
+    name = await scheduler.run(lambda: threading.current_thread().name)
+    assert name.startswith("sunspec")
+
+    release_scheduler(hass, "a")
+    assert "scheduler" not in hass.data[DOMAIN_DATA]
+    release_scheduler(hass, "a")
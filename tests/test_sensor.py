@@ -1,9 +1,18 @@
 """Test SunSpec sensor."""
 
+from homeassistant.const import EntityCategory
 from homeassistant.core import HomeAssistant
+from homeassistant.helpers import entity_registry as er
 
+from custom_components.sunspec.const import CONF_ENABLED_MODELS
+from custom_components.sunspec.const import DOMAIN
+from custom_components.sunspec.sensor import BitfieldDecoder
+from custom_components.sunspec.sensor import DESCRIPTORS
 from custom_components.sunspec.sensor import ICON_DC_AMPS
+from custom_components.sunspec.sensor import SunSpecSensor
+from custom_components.sunspec.sensor import enum_lookup
 
+from . import TEST_CONFIG_ENTRY_ID
 from . import TEST_INVERTER_MM_SENSOR_POWER_ENTITY_ID
 from . import TEST_INVERTER_MM_SENSOR_STATE_ENTITY_ID
 from . import TEST_INVERTER_PREFIX_SENSOR_DC_ENTITY_ID
@@ -12,6 +21,9 @@ from . import TEST_INVERTER_SENSOR_ENERGY_ENTITY_ID
 from . import TEST_INVERTER_SENSOR_POWER_ENTITY_ID
 from . import TEST_INVERTER_SENSOR_STATE_ENTITY_ID
 from . import TEST_INVERTER_SENSOR_VAR_ID
+from . import TEST_POLL_SENSOR_DURATION_ENTITY_ID
+from . import create_mock_sunspec_client
+from . import set_point_value
 from . import setup_mock_sunspec_config_entry
 from .const import MOCK_CONFIG_MM
 from .const import MOCK_CONFIG_PREFIX
@@ -104,3 +116,107 @@ async def test_sensor_power_mm(hass: HomeAssistant, sunspec_client_mock) -> None
     entity_state = hass.states.get(TEST_INVERTER_MM_SENSOR_POWER_ENTITY_ID)
     assert entity_state
     assert entity_state.state == "9700"
+
+
+async def test_sensor_changed_only(
+    hass: HomeAssistant, sunspec_client_mock, mocker
+) -> None:
+    """Verify only sensors with changed values are updated."""
+
+    await setup_mock_sunspec_config_entry(hass)
+    coordinator = hass.data[DOMAIN][TEST_CONFIG_ENTRY_ID]
+    write_state = mocker.patch.object(SunSpecSensor, "async_write_ha_state")
+
+    coordinator.async_update_listeners()
+    write_state.assert_not_called()
+
+    set_point_value(coordinator.data[103], "W", 801)
+    coordinator.async_update_listeners()
+    write_state.assert_called_once()
+    write_state.reset_mock()
+    coordinator.async_update_listeners()
+    write_state.assert_not_called()
+
+    # Availability changes are published to all sensors
+    coordinator.last_update_success = False
+    coordinator.async_update_listeners()
+    assert write_state.call_count == len(list(coordinator.async_contexts()))
+    write_state.reset_mock()
+    coordinator.async_update_listeners()
+    write_state.assert_not_called()
+
+
+async def test_poll_sensors(hass: HomeAssistant, sunspec_client_mock) -> None:
+    """Verify poll statistics are exposed as diagnostic sensors."""
+
+    await setup_mock_sunspec_config_entry(hass)
+
+    entry = er.async_get(hass).async_get(TEST_POLL_SENSOR_DURATION_ENTITY_ID)
+    assert entry.entity_category == EntityCategory.DIAGNOSTIC
+    assert entry.unique_id == f"{TEST_CONFIG_ENTRY_ID}_poll_cycle_duration"
+    assert float(hass.states.get(TEST_POLL_SENSOR_DURATION_ENTITY_ID).state) >= 0
+    assert hass.states.get("sensor.poll_retries").state == "0"
+
+
+async def test_sensor_stale(hass: HomeAssistant, sunspec_client_mock) -> None:
+    """Verify the last values are shown as assumed while the device is away."""
+
+    await setup_mock_sunspec_config_entry(hass)
+    coordinator = hass.data[DOMAIN][TEST_CONFIG_ENTRY_ID]
+
+    sensors = hass.data["entity_components"]["sensor"]
+    power = sensors.get_entity(TEST_INVERTER_SENSOR_POWER_ENTITY_ID)
+    poll = sensors.get_entity(TEST_POLL_SENSOR_DURATION_ENTITY_ID)
+    assert not power.assumed_state
+
+    coordinator.stale = True
+    assert power.assumed_state
+    assert power.native_value == 800
+    assert not poll.assumed_state
+
+
+async def test_sensor_descriptors(
+    hass: HomeAssistant, sunspec_client_mock, mocker
+) -> None:
+    """Verify sensors share descriptors and reuse the common model just read."""
+
+    client = create_mock_sunspec_client(hass)
+    get_device_info = mocker.spy(client, "async_get_device_info")
+    await setup_mock_sunspec_config_entry(
+        hass,
+        {**MOCK_CONFIG_MM, CONF_ENABLED_MODELS: [1, 701]},
+        client=client,
+    )
+    get_device_info.assert_not_called()
+
+    sensors = [
+        entity
+        for entity in hass.data["entity_components"]["sensor"].entities
+        if isinstance(entity, SunSpecSensor) and entity.model_id == 701
+    ]
+    first, second = [sensor for sensor in sensors if sensor.key == "W"]
+    assert (first.model_index, second.model_index) == (0, 1)
+    assert first._meta is second._meta
+    assert DESCRIPTORS[(701, "W")].device_class == first.device_class
+    assert first.device_info["manufacturer"] == "SunSpecTest"
+
+
+def test_symbol_lookups() -> None:
+    """Verify enum and bitfield symbols decode like the point definitions say."""
+    symbols = [
+        {"name": "OFF", "value": 1},
+        {"name": "ON", "value": 2},
+        {"name": "DUP_A", "value": 3},
+        {"name": "DUP_B", "value": 3},
+    ]
+    names = enum_lookup(symbols)
+    assert names[1] == "OFF"
+    assert names[3] is None
+    assert names.get(4) is None
+
+    decode = BitfieldDecoder(symbols[:2])
+    assert decode(0) == ""
+    assert decode(0b110) == "OFF,ON"
+    for val in range(BitfieldDecoder.CACHE_SIZE + 1):
+        decode(val)
+    assert decode(0b100) == "ON"
@@ -0,0 +1,71 @@
+"""Test SunSpec poll statistics."""
+
+from types import SimpleNamespace
+
+from custom_components.sunspec.stats import Histogram
+from custom_components.sunspec.stats import PollStats
+
+
+def test_histogram():
+    histogram = Histogram((10, 100))
+    for value in (1, 10, 11, 500):
+        histogram.add(value)
+    assert histogram.as_dict() == {"<=10ms": 2, "<=100ms": 1, ">100ms": 1}
+
+
+def test_record_reads():
+    stats = PollStats()
+    models = [SimpleNamespace(model_id=1), SimpleNamespace(model_id=103)]
+    # One read of both models, then the rest of the second one
+    stats.record_reads(
+        models, [[(0, 20)], [(20, 140)]], [(0, 125, 0.5), (125, 35, 0.1)]
+    )
+    assert stats.cycle.registers == 160
+    assert stats.cycle.models[1] == (0.5 * 20 / 125, 20)
+    latency, registers = stats.cycle.models[103]
+    assert round(latency, 6) == round(0.5 * 105 / 125 + 0.1, 6)
+    assert registers == 140
+
+
+def test_cycles(mocker):
+    monotonic = mocker.patch(
+        "custom_components.sunspec.stats.time.monotonic", return_value=100.0
+    )
+    stats = PollStats()
+    assert stats.summary() == {}
+
+    stats.start_cycle()
+    stats.record_request(0.02)
+    stats.record_pacing(0.1)
+    stats.record_retry()
+    stats.record_reconnect()
+    stats.record_timeout()
+    stats.record_model(103, 0.02, 52)
+    monotonic.return_value = 101.5
+    stats.end_cycle(True, 30)
+
+    assert stats.summary() == {
+        "cycle_duration": 1500.0,
+        "cycle_budget": 5.0,
+        "requests": 1,
+        "registers": 0,
+        "pacing": 100.0,
+        "retries": 1,
+        "reconnects": 1,
+        "timeouts": 1,
+    }
+    # The next cycle starts from scratch, totals keep counting
+    stats.start_cycle()
+    stats.record_timeout()
+    stats.end_cycle(False, 30)
+    assert stats.summary()["timeouts"] == 2
+    assert stats.summary()["requests"] == 0
+
+    data = stats.as_dict()
+    assert data["cycles"] == 2
+    assert data["failures"] == 1
+    assert len(data["history"]) == 2
+    assert data["history"][0]["models"] == {103: {"latency_ms": 20.0, "registers": 52}}
+    assert data["histograms"]["request_latency"]["<=25ms"] == 1
+    assert data["histograms"]["cycle_duration"]["<=10ms"] == 1
+    assert data["histograms"]["model_latency"][103]["<=25ms"] == 1
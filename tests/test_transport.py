@@ -0,0 +1,261 @@
+"""Tests for the SunSpec asyncio Modbus TCP transport."""
+
+import asyncio
+import time
+
+import pytest
+from sunspec2.modbus.modbus import ModbusClientError
+from sunspec2.modbus.modbus import ModbusClientException
+from sunspec2.modbus.modbus import ModbusClientTimeout
+
+from custom_components.sunspec.stats import PollStats
+from custom_components.sunspec.transport import ModbusGatewayException
+from custom_components.sunspec.transport import ModbusTcpTransport
+from custom_components.sunspec.transport import PACING_DELAY_MAX
+from custom_components.sunspec.transport import PACING_DELAY_STEP
+from custom_components.sunspec.transport import PRIORITY_BACKGROUND
+from custom_components.sunspec.transport import PRIORITY_INTERACTIVE
+from custom_components.sunspec.transport import PRIORITY_TELEMETRY
+from custom_components.sunspec.transport import PriorityLock
+from custom_components.sunspec.transport import RTT_MIN_SAMPLES
+from custom_components.sunspec.transport import RTT_TIMEOUT_FACTOR
+from custom_components.sunspec.transport import RequestPacer
+from custom_components.sunspec.transport import ResponseTimer
+
+
+async def start_server(handle):
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, server.sockets[0].getsockname()[1]
+
+
+async def test_transport_read(hass, modbus_server):
+    transport = ModbusTcpTransport("127.0.0.1", modbus_server.port, 5)
+    assert not transport.connected
+
+    assert await transport.read(1, 40000, 2) == b"SunS"
+    assert await transport.read(1, 40002, 2) == b"\x00\x01\x00\x42"
+    assert transport.connected
+    assert modbus_server.connections == 1
+
+    with pytest.raises(ModbusClientException) as rejected:
+        await transport.read(1, 60000, 10)
+    assert not isinstance(rejected.value, ModbusGatewayException)
+    # The gateway answers for units that are not there
+    with pytest.raises(ModbusGatewayException):
+        await transport.read(9, 40000, 2)
+    with pytest.raises(ValueError):
+        await transport.read(1, 40000, 126)
+
+    transport.close()
+    assert not transport.connected
+
+
+def test_request_pacer():
+    pacer = RequestPacer()
+    pacer.record_response(0.05)
+    pacer.record_response(0.05)
+    assert pacer.delay == 0
+
+    pacer.record_timeout()
+    assert pacer.delay == PACING_DELAY_STEP
+    pacer.record_timeout()
+    assert pacer.delay == PACING_DELAY_STEP * 2
+    pacer.record_response(1.0)
+    assert pacer.delay == pytest.approx(PACING_DELAY_STEP * 3)
+
+    for _ in range(10):
+        pacer.record_timeout()
+    assert pacer.delay == PACING_DELAY_MAX
+
+    for _ in range(200):
+        pacer.record_response(0.05)
+    assert pacer.delay == 0
+
+
+async def test_transport_pacing(hass, modbus_server):
+    simulator = modbus_server
+    simulator.latency = 0.05
+    transport = ModbusTcpTransport("127.0.0.1", simulator.port, 0.5)
+    stats = PollStats()
+
+    # Only the request is timed, not the wait for the connection
+    await asyncio.gather(*[transport.read(1, 40000, 2) for _ in range(4)])
+    assert transport.pacer.response_time < 0.1
+    assert transport.pacer.delay == 0
+
+    simulator.timeout_rate = 1.0
+    with pytest.raises(ModbusClientTimeout):
+        await transport.read(1, 40000, 2, stats=stats)
+    assert transport.pacer.delay == PACING_DELAY_STEP
+    assert stats.cycle.timeouts == 1
+
+    # The delay is waited holding the connection, ahead of the request
+    simulator.timeout_rate = 0.0
+    order = []
+
+    async def read(name, priority):
+        await transport.read(1, 40000, 2, priority, stats)
+        order.append((name, time.monotonic()))
+
+    start = time.monotonic()
+    await asyncio.gather(read("first", 1), read("second", 1))
+    assert [name for name, _ in order] == ["first", "second"]
+    assert order[1][1] - start >= 2 * PACING_DELAY_STEP * 0.9
+    assert stats.cycle.requests == 2
+    assert stats.cycle.pacing > 0
+
+    transport.close()
+
+
+def test_response_timer():
+    timer = ResponseTimer(1, 30)
+    for _ in range(RTT_MIN_SAMPLES - 1):
+        timer.record(0.01)
+    assert timer.timeout == 30
+    timer.record(0.01)
+    assert timer.timeout == 1
+
+    # Slow responses and timeouts raise the timeout, up to the ceiling
+    for _ in range(10):
+        timer.record(2)
+    assert timer.timeout == 2 * RTT_TIMEOUT_FACTOR
+    for _ in range(20):
+        timer.record(timer.timeout)
+    assert timer.timeout == 30
+
+
+async def test_priority_lock(hass):
+    lock = PriorityLock()
+    order = []
+
+    async def request(name, priority):
+        async with lock.hold(priority):
+            order.append(name)
+            await asyncio.sleep(0)
+
+    await lock.acquire(PRIORITY_TELEMETRY)
+    tasks = [
+        asyncio.create_task(request(name, priority))
+        for name, priority in (
+            ("static", PRIORITY_BACKGROUND),
+            ("live 1", PRIORITY_TELEMETRY),
+            ("ui", PRIORITY_INTERACTIVE),
+            ("live 2", PRIORITY_TELEMETRY),
+        )
+    ]
+    await asyncio.sleep(0)
+    assert order == []
+    lock.release()
+    await asyncio.gather(*tasks)
+    assert order == ["ui", "live 1", "live 2", "static"]
+    assert not lock.locked()
+
+
+async def test_priority_lock_cancelled(hass):
+    lock = PriorityLock()
+    await lock.acquire(PRIORITY_TELEMETRY)
+
+    # A cancelled waiter is skipped
+    waiting = asyncio.create_task(lock.acquire(PRIORITY_INTERACTIVE))
+    await asyncio.sleep(0)
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+    lock.release()
+    assert not lock.locked()
+
+    # A waiter cancelled as it was handed the lock passes it on
+    await lock.acquire(PRIORITY_TELEMETRY)
+    first = asyncio.create_task(lock.acquire(PRIORITY_INTERACTIVE))
+    second = asyncio.create_task(lock.acquire(PRIORITY_BACKGROUND))
+    await asyncio.sleep(0)
+    lock.release()
+    first.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    await second
+    assert lock.locked()
+    lock.release()
+    assert not lock.locked()
+
+
+async def test_transport_learned_timeout(hass, modbus_server):
+    transport = ModbusTcpTransport("127.0.0.1", modbus_server.port, 5, 1, 0.5)
+    assert transport.timer.timeout == 5
+    for _ in range(RTT_MIN_SAMPLES):
+        await transport.read(1, 40000, 2)
+    assert transport.timer.timeout == 0.5
+    transport.close()
+
+
+async def test_transport_connect_error(hass, socket_enabled):
+    server, port = await start_server(lambda reader, writer: writer.close())
+    server.close()
+    await server.wait_closed()
+
+    transport = ModbusTcpTransport("127.0.0.1", port, 5)
+    with pytest.raises(ModbusClientError):
+        await transport.read(1, 40000, 2)
+
+
+async def test_transport_connection_dropped(hass, socket_enabled):
+    server, port = await start_server(lambda reader, writer: writer.close())
+
+    transport = ModbusTcpTransport("127.0.0.1", port, 5)
+    with pytest.raises(ModbusClientError):
+        await transport.read(1, 40000, 2)
+    assert not transport.connected
+
+    server.close()
+    await server.wait_closed()
+
+
+async def test_transport_timeout(hass, socket_enabled):
+    writers = []
+    server, port = await start_server(lambda reader, writer: writers.append(writer))
+
+    transport = ModbusTcpTransport("127.0.0.1", port, 0.05)
+    with pytest.raises(ModbusClientTimeout):
+        await transport.read(1, 40000, 2)
+    assert not transport.connected
+
+    for writer in writers:
+        writer.close()
+    server.close()
+    await server.wait_closed()
+
+
+async def test_transport_unexpected_transaction(hass, socket_enabled):
+    async def handle(reader, writer):
+        await reader.readexactly(12)
+        writer.write(b"\x99\x99\x00\x00\x00\x07\x01\x03\x04SunS")
+        await writer.drain()
+        writer.close()
+
+    server, port = await start_server(handle)
+
+    transport = ModbusTcpTransport("127.0.0.1", port, 5)
+    with pytest.raises(ModbusClientError):
+        await transport.read(1, 40000, 2)
+    assert not transport.connected
+
+    server.close()
+    await server.wait_closed()
+
+
+async def test_transport_shared(hass, modbus_server):
+    transport = ModbusTcpTransport("127.0.0.1", modbus_server.port, 5)
+
+    results = await asyncio.gather(
+        *[transport.read(unit_id, 40000, 2) for unit_id in (1, 2, 3)]
+    )
+    assert results == [b"SunS"] * 3
+    assert modbus_server.unit_ids == {1, 2, 3}
+    assert modbus_server.connections == 1
+
+    # Closing while a request is in flight waits for its response
+    read = asyncio.ensure_future(transport.read(1, 40000, 2))
+    await asyncio.sleep(0)
+    transport.close()
+    assert await read == b"SunS"
+    assert not transport.connected